@@ -1,8 +1,10 @@
 """
 Build a face recognition database from images.
 
-This script processes face images from a directory structure and builds a JSON database 
-of face embeddings for recognition. The directory structure should be:
+This script processes face images from a directory structure and builds a database 
+of face embeddings for recognition. Person records are written to the output
+JSON file and the embeddings to a binary matrix next to it, e.g.
+face_database.npy (see embedding_store). The directory structure should be:
 
 root_dir/
   person1/
@@ -21,13 +23,15 @@ Usage:
 import os
 import cv2
 import numpy as np
-import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 from face_detector import FaceDetector
 from face_recognizer import FaceRecognizer
+from embedding_store import embeddings_path, load_person_records, save_embedding_store
 
 def parse_args():
     """Parse command line arguments"""
@@ -35,7 +39,7 @@ def parse_args():
     parser.add_argument("--input_dir", type=str, required=True,
                         help="Directory containing person folders with face images")
     parser.add_argument("--output_db", type=str, default="face_database.json",
-                        help="Output JSON database file path")
+                        help="Output database JSON path (embeddings are written next to it as .npy)")
     parser.add_argument("--max_images", type=int, default=5,
                         help="Maximum number of images to process per person")
     parser.add_argument("--min_face_size", type=int, default=80,
@@ -44,14 +48,17 @@ def parse_args():
                         help="Confidence threshold for face detection")
     parser.add_argument("--augment", action="store_true",
                         help="Apply data augmentation to increase sample diversity")
+    parser.add_argument("--show", action="store_true",
+                        help="Display each processed face (adds a 100ms pause per image)")
+    parser.add_argument("--decode_scale", type=int, default=1, choices=[1, 2, 4, 8],
+                        help="Downscale factor applied while decoding, for photos much larger than the faces need")
     return parser.parse_args()
 
 def load_existing_database(db_path: str) -> Dict[str, Dict[str, Any]]:
     """Load existing database if available"""
     if os.path.exists(db_path):
         try:
-            with open(db_path, 'r') as f:
-                database = json.load(f)
+            database = load_person_records(db_path)
             print(f"Loaded existing database with {len(database)} persons")
             return database
         except Exception as e:
@@ -61,14 +68,38 @@ def load_existing_database(db_path: str) -> Dict[str, Dict[str, Any]]:
     return {}
 
 def save_database(database: Dict[str, Dict[str, Any]], db_path: str) -> None:
-    """Save database to JSON file"""
+    """Save database as JSON person records plus an embedding matrix"""
     try:
-        with open(db_path, 'w') as f:
-            json.dump(database, f, indent=2)
-        print(f"Saved database with {len(database)} persons to {db_path}")
+        save_embedding_store(database, db_path)
+        print(f"Saved database with {len(database)} persons to {db_path} and {embeddings_path(db_path)}")
     except Exception as e:
         print(f"Error saving database: {e}")
 
+# imdecode flags that downscale by the given factor while decoding
+DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# File extensions picked up from each person directory
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+# Brightness offset applied to every channel by augment_face
+BRIGHTNESS_SHIFT = (30, 30, 30, 0)
+
+@lru_cache(maxsize=64)
+def _rotation_matrices(w: int, h: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the clockwise and counter-clockwise 5 degree rotation matrices used
+    by augment_face for faces of one size. Only the most recently used
+    sizes are kept, since crop sizes vary from image to image.
+    """
+    center = (w // 2, h // 2)
+    return (cv2.getRotationMatrix2D(center, -5, 1.0),
+            cv2.getRotationMatrix2D(center, 5, 1.0))
+
 def augment_face(face_img: np.ndarray) -> List[np.ndarray]:
     """
     Create augmented versions of a face image to improve recognition robustness.
@@ -85,37 +116,61 @@ def augment_face(face_img: np.ndarray) -> List[np.ndarray]:
     flipped = cv2.flip(face_img, 1)
     augmented.append(flipped)
     
-    # 2. Slightly brighter
-    brightness = np.ones(face_img.shape, dtype=np.uint8) * 30
-    brightened = cv2.add(face_img, brightness)
+    # 2. Slightly brighter (saturating add of a per-channel scalar,
+    # without allocating a constant image)
+    brightened = cv2.add(face_img, BRIGHTNESS_SHIFT)
     augmented.append(brightened)
     
     # 3. Slightly darker
-    darkness = np.ones(face_img.shape, dtype=np.uint8) * 30
-    darkened = cv2.subtract(face_img, darkness)
+    darkened = cv2.subtract(face_img, BRIGHTNESS_SHIFT)
     augmented.append(darkened)
     
-    # 4. Small rotation clockwise (5 degrees)
+    # Faces of the same size share their rotation matrices
     h, w = face_img.shape[:2]
-    center = (w // 2, h // 2)
-    M = cv2.getRotationMatrix2D(center, -5, 1.0)
-    rotated_cw = cv2.warpAffine(face_img, M, (w, h))
+    M_cw, M_ccw = _rotation_matrices(w, h)
+    
+    # 4. Small rotation clockwise (5 degrees)
+    rotated_cw = cv2.warpAffine(face_img, M_cw, (w, h))
     augmented.append(rotated_cw)
     
     # 5. Small rotation counter-clockwise (5 degrees)
-    M = cv2.getRotationMatrix2D(center, 5, 1.0)
-    rotated_ccw = cv2.warpAffine(face_img, M, (w, h))
+    rotated_ccw = cv2.warpAffine(face_img, M_ccw, (w, h))
     augmented.append(rotated_ccw)
     
     return augmented
 
+def read_image(img_path: Path, decode_scale: int = 1) -> Optional[np.ndarray]:
+    """
+    Read an image file (BGR), returning None if it cannot be read.
+    
+    Args:
+        img_path: Path of the image file
+        decode_scale: Factor (1, 2, 4 or 8) to downscale by while decoding;
+                      JPEG decoding at a reduced scale skips most of the work
+        
+    Returns:
+        Decoded image or None
+    """
+    try:
+        data = np.fromfile(img_path, dtype=np.uint8)
+    except OSError:
+        return None
+        
+    if data.size == 0:
+        return None
+        
+    return cv2.imdecode(data, DECODE_FLAGS[decode_scale])
+
 def process_person_images(person_id: str, 
                           image_dir: Path, 
                           detector: FaceDetector, 
                           recognizer: FaceRecognizer,
                           max_images: int,
                           min_face_size: int,
-                          do_augment: bool) -> Dict[str, Any]:
+                          do_augment: bool,
+                          do_show: bool = False,
+                          decode_scale: int = 1,
+                          executor: Optional[ThreadPoolExecutor] = None) -> Dict[str, Any]:
     """
     Process images for a single person and generate face embeddings.
     
@@ -127,6 +182,9 @@ def process_person_images(person_id: str,
         max_images: Maximum number of images to process
         min_face_size: Minimum face size to include
         do_augment: Whether to apply data augmentation
+        do_show: Whether to display each processed face
+        decode_scale: Factor to downscale images by while decoding
+        executor: Thread pool used to read images ahead of processing
         
     Returns:
         Person data dictionary with embeddings
@@ -141,11 +199,11 @@ def process_person_images(person_id: str,
         "embeddings": []
     }
     
-    # Get image files
-    image_files = []
-    for ext in ['.jpg', '.jpeg', '.png']:
-        image_files.extend(list(image_dir.glob(f"*{ext}")))
-        image_files.extend(list(image_dir.glob(f"*{ext.upper()}")))
+    # Get image files in a single directory scan, matching extensions in any case
+    image_files = sorted(
+        Path(entry.path) for entry in os.scandir(image_dir)
+        if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS
+    )
     
     # Limit to max_images
     if len(image_files) > max_images:
@@ -154,13 +212,16 @@ def process_person_images(person_id: str,
     else:
         print(f"Found {len(image_files)} images")
     
+    # Read and decode images on the pool while faces are detected and
+    # embedded here; the models themselves are not thread-safe
+    read = partial(read_image, decode_scale=decode_scale)
+    images = executor.map(read, image_files) if executor else map(read, image_files)
+    
     # Process each image
     successful_images = 0
-    for img_path in image_files:
+    for img_path, img in zip(image_files, images):
         print(f"  Processing {img_path.name}...", end="")
         
-        # Read image
-        img = cv2.imread(str(img_path))
         if img is None:
             print(" ERROR: Could not read image")
             continue
@@ -173,19 +234,15 @@ def process_person_images(person_id: str,
             continue
         
         # Use the largest face
-        largest_idx = 0
-        largest_area = 0
-        for i, meta in enumerate(metadata):
-            x1, y1, x2, y2 = meta["bbox"]
-            area = (x2 - x1) * (y2 - y1)
-            if area > largest_area:
-                largest_area = area
-                largest_idx = i
+        bboxes = np.array([meta["bbox"] for meta in metadata])
+        areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+        largest_idx = int(areas.argmax())
         
         face_img = faces[largest_idx]
         bbox = metadata[largest_idx]["bbox"]
-        width = bbox[2] - bbox[0]
-        height = bbox[3] - bbox[1]
+        # Compare sizes in original image pixels
+        width = (bbox[2] - bbox[0]) * decode_scale
+        height = (bbox[3] - bbox[1]) * decode_scale
         
         # Skip if face is too small
         if width < min_face_size or height < min_face_size:
@@ -195,20 +252,24 @@ def process_person_images(person_id: str,
         # Apply augmentation if requested
         face_images = augment_face(face_img) if do_augment else [face_img]
         
-        # Generate embeddings for each face version
-        for i, f_img in enumerate(face_images):
-            embedding = recognizer.generate_embedding(f_img)
-            if len(embedding) > 0:
-                person_data["embeddings"].append(embedding.tolist())
-                
+        # Generate embeddings for all face versions in one forward pass
+        embeddings = recognizer.generate_embeddings_batch(face_images)
+        if len(embeddings) == 0:
+            print(" ERROR: Could not generate embeddings")
+            continue
+            
+        person_data["embeddings"].extend(embeddings.tolist())
+        
         successful_images += 1
         print(f" OK - Added {len(face_images)} embeddings")
         
         # Display progress
-        cv2.imshow("Processing", cv2.resize(face_img, (200, 200)))
-        cv2.waitKey(100)
+        if do_show:
+            cv2.imshow("Processing", cv2.resize(face_img, (200, 200)))
+            cv2.waitKey(100)
     
-    cv2.destroyAllWindows()
+    if do_show:
+        cv2.destroyAllWindows()
     
     print(f"Successfully processed {successful_images}/{len(image_files)} images")
     print(f"Total embeddings for {person_name}: {len(person_data['embeddings'])}")
@@ -241,26 +302,30 @@ def build_database(args):
     print(f"Found {len(person_dirs)} person directories")
     
     # Process each person
-    for person_dir in person_dirs:
-        person_id = person_dir.name
-        
-        # Process person's images
-        person_data = process_person_images(
-            person_id=person_id,
-            image_dir=person_dir,
-            detector=detector,
-            recognizer=recognizer,
-            max_images=args.max_images,
-            min_face_size=args.min_face_size,
-            do_augment=args.augment
-        )
-        
-        # Add/update person in database
-        if len(person_data["embeddings"]) > 0:
-            database[person_id] = person_data
-            print(f"Added/updated {person_id} in database")
-        else:
-            print(f"No valid embeddings generated for {person_id}, skipping")
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for person_dir in person_dirs:
+            person_id = person_dir.name
+            
+            # Process person's images
+            person_data = process_person_images(
+                person_id=person_id,
+                image_dir=person_dir,
+                detector=detector,
+                recognizer=recognizer,
+                max_images=args.max_images,
+                min_face_size=args.min_face_size,
+                do_augment=args.augment,
+                do_show=args.show,
+                decode_scale=args.decode_scale,
+                executor=executor
+            )
+            
+            # Add/update person in database
+            if len(person_data["embeddings"]) > 0:
+                database[person_id] = person_data
+                print(f"Added/updated {person_id} in database")
+            else:
+                print(f"No valid embeddings generated for {person_id}, skipping")
     
     # Save the database
     save_database(database, args.output_db)
@@ -0,0 +1,46 @@
+"""
+Convert a JSON face database written by older versions to the binary
+embedding store.
+
+Older JSON databases store every embedding as a list of floats, which is slow
+to parse and has to be converted to arrays again before recognition. This
+script moves the embeddings, unchanged, into a single matrix (.npy) that can
+be memory-mapped at startup, and rewrites the JSON file in place with only the
+person records and the matrix rows of each person.
+
+For data/face_database.json it creates data/face_database.npy.
+
+Usage:
+  python convert_database.py --database data/face_database.json
+"""
+
+import os
+import argparse
+
+from embedding_store import embeddings_path, load_person_records, save_embedding_store
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Convert a JSON face database to a binary embedding store")
+    parser.add_argument("--database", type=str, default="data/face_database.json",
+                        help="Path to face database JSON file")
+    return parser.parse_args()
+
+def main():
+    """Main function"""
+    args = parse_args()
+    
+    if not os.path.exists(args.database):
+        print(f"Error: Database file {args.database} not found")
+        return
+    
+    database = load_person_records(args.database, mmap=False)
+    
+    num_embeddings = save_embedding_store(database, args.database)
+    
+    print(f"Converted {len(database)} persons with {num_embeddings} embeddings")
+    print(f"  Person records: {args.database}")
+    print(f"  Embeddings: {embeddings_path(args.database)}")
+
+if __name__ == "__main__":
+    main()
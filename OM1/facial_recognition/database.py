@@ -1,20 +1,42 @@
 """
 Database module for managing person records and embeddings.
-Uses JSON for storing data locally with plans for Firebase integration.
+Stores person records as JSON and their embeddings as a binary matrix next to
+it locally (see embedding_store), with plans for Firebase integration.
 """
 
 import os
-import json
+import shutil
 import numpy as np
 import cv2
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Union
-import time
+from typing import Dict, List, Any, Optional, Tuple, Union
 from datetime import datetime
 import uuid
+import atexit
+import weakref
+
+from .embedding_store import load_embedding_store, save_embedding_store
+
+# Databases with possibly unsaved changes, flushed at interpreter exit. Held
+# weakly so that registering does not keep a database alive
+_open_databases = weakref.WeakSet()
+
+@atexit.register
+def _flush_open_databases() -> None:
+    """Write pending changes of all databases still alive at exit."""
+    for database in list(_open_databases):
+        database.flush()
 
 class PersonDatabase:
-    """Database for managing person records and face embeddings."""
+    """
+    Database for managing person records and face embeddings.
+    
+    Mutations (add_person, add_face_image, add_face_image_batch,
+    add_embedding, remove_person) only change the in-memory records, so a
+    batch of them is written once. Call flush() to save them; changes not
+    flushed are written at interpreter exit as long as the database is
+    still referenced, and are lost if it is garbage collected first.
+    """
     
     def __init__(self, 
                 database_path: str = "data/person_database.json",
@@ -23,7 +45,8 @@ class PersonDatabase:
         Initialize the person database.
         
         Args:
-            database_path: Path to the JSON database file
+            database_path: Path to the JSON database file. Embeddings are
+                           saved next to it (e.g. person_database.npy)
             image_folder: Path to the folder storing person images
         """
         self.database_path = Path(database_path)
@@ -33,42 +56,84 @@ class PersonDatabase:
         self.database_path.parent.mkdir(parents=True, exist_ok=True)
         self.image_folder.mkdir(parents=True, exist_ok=True)
         
+        # All embeddings stacked into one matrix, with the person ID of each
+        # row; rebuilt on demand after embeddings change
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: Optional[np.ndarray] = None
+        
         # Initialize or load database
         self.database = self._load_database()
         
+        # Mutations only mark the database dirty; it is written by flush()
+        self._dirty = False
+        _open_databases.add(self)
+        
     def _load_database(self) -> Dict[str, Dict[str, Any]]:
         """
-        Load the database from the JSON file.
-        Creates a new empty database if file doesn't exist.
+        Load the database and its embedding matrix, or a JSON file with
+        embedded lists written by older versions.
+        Creates a new empty database if the file doesn't exist.
         
         Returns:
             Dictionary containing person records
         """
-        if self.database_path.exists():
-            try:
-                with open(self.database_path, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Error loading database: {str(e)}")
-                return {}
-        else:
-            return {}
+        try:
+            if self.database_path.exists():
+                # Keep the memory-mapped matrix as the stacked embeddings;
+                # person records hold views of their rows
+                matrix, owner_ids, database = load_embedding_store(self.database_path)
+                for person_data in database.values():
+                    row_start = person_data.pop("row_start")
+                    row_end = person_data.pop("row_end")
+                    person_data["embeddings"] = list(matrix[row_start:row_end])
+                    
+                self._matrix, self._ids = matrix, owner_ids
+                return database
+        except Exception as e:
+            print(f"Error loading database: {str(e)}")
+            
+        return {}
+    
+    def reload(self) -> None:
+        """
+        Write pending changes and reload the database from disk, picking up
+        changes saved by other processes.
+        """
+        self.flush()
+        self._matrix = self._ids = None
+        self.database = self._load_database()
     
     def _save_database(self) -> bool:
         """
-        Save the database to the JSON file.
+        Save the person records as JSON plus an embedding matrix.
         
         Returns:
             True if successful, False otherwise
         """
         try:
-            with open(self.database_path, 'w') as f:
-                json.dump(self.database, f, indent=2)
+            save_embedding_store(self.database, self.database_path)
             return True
         except Exception as e:
             print(f"Error saving database: {str(e)}")
             return False
     
+    def flush(self) -> bool:
+        """
+        Write pending changes to disk. Must be called after mutations for
+        them to be saved (see the class docstring).
+        
+        Returns:
+            True if there was nothing to write or saving succeeded, False otherwise
+        """
+        if not self._dirty:
+            return True
+            
+        if not self._save_database():
+            return False
+            
+        self._dirty = False
+        return True
+    
     def add_person(self, 
                   name: str,
                   relation: str,
@@ -95,19 +160,19 @@ class PersonDatabase:
             print(f"Person with ID {person_id} already exists, updating info")
             
         # Create or update person record
+        now = datetime.now().isoformat()
         self.database[person_id] = {
             "id": person_id,
             "name": name,
             "relation": relation,
             "notes": notes,
-            "created": datetime.now().isoformat(),
-            "updated": datetime.now().isoformat(),
+            "created": now,
+            "updated": now,
             "embeddings": self.database.get(person_id, {}).get("embeddings", []),
             "image_paths": self.database.get(person_id, {}).get("image_paths", [])
         }
         
-        # Save database
-        self._save_database()
+        self._dirty = True
         
         return person_id
     
@@ -136,7 +201,8 @@ class PersonDatabase:
         person_img_dir.mkdir(exist_ok=True)
         
         # Generate filename for image
-        timestamp = int(time.time())
+        now = datetime.now()
+        timestamp = int(now.timestamp())
         image_filename = f"{timestamp}.jpg"
         image_path = person_img_dir / image_filename
         
@@ -144,10 +210,14 @@ class PersonDatabase:
         if isinstance(image, np.ndarray):
             cv2.imwrite(str(image_path), image)
         elif isinstance(image, str):
-            # If image is a file path, copy it
+            # If image is a file path, copy it. JPEG files are copied byte for
+            # byte; other formats are converted to JPEG
             if os.path.exists(image):
-                img = cv2.imread(image)
-                cv2.imwrite(str(image_path), img)
+                if image.lower().endswith((".jpg", ".jpeg")):
+                    shutil.copyfile(image, str(image_path))
+                else:
+                    img = cv2.imread(image)
+                    cv2.imwrite(str(image_path), img)
             else:
                 print(f"Image file {image} does not exist")
                 return False
@@ -157,14 +227,66 @@ class PersonDatabase:
             
         # Update database record
         self.database[person_id]["image_paths"].append(str(image_path))
-        self.database[person_id]["updated"] = datetime.now().isoformat()
+        self.database[person_id]["updated"] = now.isoformat()
         
         # Add embedding if provided
         if embedding is not None:
             self.database[person_id]["embeddings"].append(embedding)
+            self._matrix = self._ids = None
             
-        # Save database
-        return self._save_database()
+        self._dirty = True
+        return True
+    
+    def add_face_image_batch(self,
+                             person_id: str,
+                             images: Union[np.ndarray, List[np.ndarray]],
+                             embeddings: Optional[List[List[float]]] = None) -> bool:
+        """
+        Add several face images for a person, optionally with pre-computed embeddings.
+        
+        Args:
+            person_id: Person ID
+            images: Face images, e.g. an augmented stack of shape (K, H, W, 3)
+            embeddings: Optional pre-computed embeddings, one per image
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        # Check if person exists
+        if person_id not in self.database:
+            print(f"Person with ID {person_id} does not exist")
+            return False
+            
+        if embeddings is not None and len(embeddings) != len(images):
+            print(f"Got {len(embeddings)} embeddings for {len(images)} images")
+            return False
+            
+        # Create directory for this person's images if it doesn't exist
+        person_img_dir = self.image_folder / person_id
+        person_img_dir.mkdir(exist_ok=True)
+        
+        # Number the images so a batch saved within one second does not
+        # overwrite itself
+        now = datetime.now()
+        timestamp = int(now.timestamp())
+        image_paths = []
+        
+        for i, image in enumerate(images):
+            image_path = person_img_dir / f"{timestamp}_{i}.jpg"
+            cv2.imwrite(str(image_path), image)
+            image_paths.append(str(image_path))
+            
+        # Update database record
+        self.database[person_id]["image_paths"].extend(image_paths)
+        self.database[person_id]["updated"] = now.isoformat()
+        
+        # Add embeddings if provided
+        if embeddings is not None:
+            self.database[person_id]["embeddings"].extend(embeddings)
+            self._matrix = self._ids = None
+            
+        self._dirty = True
+        return True
     
     def add_embedding(self, person_id: str, embedding: List[float]) -> bool:
         """
@@ -183,11 +305,13 @@ class PersonDatabase:
             return False
             
         # Add embedding to person record
+        now = datetime.now().isoformat()
         self.database[person_id]["embeddings"].append(embedding)
-        self.database[person_id]["updated"] = datetime.now().isoformat()
+        self.database[person_id]["updated"] = now
         
-        # Save database
-        return self._save_database()
+        self._matrix = self._ids = None
+        self._dirty = True
+        return True
     
     def remove_person(self, person_id: str) -> bool:
         """
@@ -207,8 +331,9 @@ class PersonDatabase:
         # Remove person from database
         del self.database[person_id]
         
-        # Save database
-        return self._save_database()
+        self._matrix = self._ids = None
+        self._dirty = True
+        return True
     
     def get_person(self, person_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -246,4 +371,33 @@ class PersonDatabase:
             if "embeddings" in person_data and person_data["embeddings"]:
                 recognition_db[person_id] = person_data
                 
-        return recognition_db 
\ No newline at end of file
+        return recognition_db 
+    
+    def _rebuild_index(self) -> None:
+        """Stack all embeddings into a single matrix."""
+        rows = []
+        ids = []
+        
+        for person_id, person_data in self.database.items():
+            embeddings = person_data.get("embeddings", [])
+            if len(embeddings) > 0:
+                rows.append(np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1))
+                ids.extend([person_id] * len(embeddings))
+                
+        self._matrix = np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+        self._ids = np.array(ids, dtype=object)
+    
+    def get_embedding_matrix(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get all embeddings stacked into one matrix, e.g. for
+        FaceRecognizer.set_embeddings.
+        
+        Returns:
+            Tuple containing:
+            - Embedding matrix of shape (N, D), as stored (not normalized)
+            - Person ID for each row, shape (N,)
+        """
+        if self._matrix is None:
+            self._rebuild_index()
+            
+        return self._matrix, self._ids
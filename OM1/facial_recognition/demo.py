@@ -16,7 +16,7 @@ from typing import Dict, List, Any, Optional
 from .face_detector import FaceDetector
 from .face_recognizer import FaceRecognizer
 from .database import PersonDatabase
-from .utils import augment_face_image, preprocess_image_for_recognition
+from .utils import FaceTracker, augment_face_batch, open_camera, read_latest_frame
 
 def register_person(database: PersonDatabase, 
                    recognizer: FaceRecognizer,
@@ -45,7 +45,7 @@ def register_person(database: PersonDatabase,
     person_id = database.add_person(name, relation, notes)
     
     # Open webcam
-    cap = cv2.VideoCapture(camera_id)
+    cap = open_camera(camera_id)
     
     if not cap.isOpened():
         print(f"Error: Could not open camera {camera_id}")
@@ -56,7 +56,10 @@ def register_person(database: PersonDatabase,
     print("Press ESC to cancel.")
     
     images_captured = 0
-    embeddings = []
+    
+    # Captured faces, augmented, embedded and added to the database in one
+    # batch once capturing is done
+    captured_faces = []
     
     while images_captured < num_images:
         ret, frame = cap.read()
@@ -69,7 +72,7 @@ def register_person(database: PersonDatabase,
         faces, metadata = detector.detect_faces(frame)
         
         # Draw detection on frame
-        display_frame = detector.detect_faces_and_draw(frame)
+        display_frame = detector.detect_faces_and_draw(frame, metadata)
         
         # Show info
         cv2.putText(display_frame, f"Captured: {images_captured}/{num_images}", 
@@ -89,24 +92,7 @@ def register_person(database: PersonDatabase,
             
         # Capture image
         if key == 32 and faces:  # SPACE key and faces detected
-            face_img = faces[0]  # Use the first detected face
-            
-            # Preprocess the face image
-            face_img = preprocess_image_for_recognition(face_img)
-            
-            # Add original face image to database
-            embedding = recognizer.generate_embedding(face_img).tolist()
-            database.add_face_image(person_id, face_img, embedding)
-            embeddings.append(embedding)
-            
-            # Create augmented versions
-            augmented_faces = augment_face_image(face_img, num_augmentations)
-            
-            # Add each augmented face
-            for aug_face in augmented_faces[1:]:  # Skip the first one (original)
-                aug_embedding = recognizer.generate_embedding(aug_face).tolist()
-                database.add_face_image(person_id, aug_face, aug_embedding)
-                embeddings.append(aug_embedding)
+            captured_faces.append(faces[0])  # Use the first detected face
             
             print(f"Captured image {images_captured + 1}/{num_images}")
             images_captured += 1
@@ -119,10 +105,25 @@ def register_person(database: PersonDatabase,
     cv2.destroyAllWindows()
     
     if images_captured > 0:
-        print(f"Successfully registered {name} with {len(embeddings)} face embeddings.")
+        # Augment every capture in one batched call, then embed the originals
+        # and all augmentations in a single forward pass
+        augmented_faces = augment_face_batch(captured_faces, num_augmentations)
+        face_images = captured_faces + list(augmented_faces)
+        embeddings = recognizer.generate_embeddings_batch(face_images)
+        
+        if len(embeddings) > 0:
+            # Save all images and embeddings with a single database update
+            database.add_face_image_batch(person_id, face_images, embeddings)
+            print(f"Successfully registered {name} with {len(embeddings)} face embeddings.")
+        else:
+            print("Registration failed. Could not generate face embeddings.")
+            database.remove_person(person_id)
     else:
         print("Registration failed. No images captured.")
         database.remove_person(person_id)
+        
+    # Write the registration to disk once, rather than after every image
+    database.flush()
 
 def run_recognition_demo(database: PersonDatabase,
                         recognizer: FaceRecognizer,
@@ -140,7 +141,7 @@ def run_recognition_demo(database: PersonDatabase,
         recognition_interval: Time between recognition attempts (seconds)
     """
     # Open webcam
-    cap = cv2.VideoCapture(camera_id)
+    cap = open_camera(camera_id)
     
     if not cap.isOpened():
         print(f"Error: Could not open camera {camera_id}")
@@ -151,6 +152,8 @@ def run_recognition_demo(database: PersonDatabase,
     
     # Get recognition database (with embeddings)
     recognition_db = database.get_database_for_recognition()
+    matrix, owner_ids = database.get_embedding_matrix()
+    recognizer.set_embeddings(matrix, owner_ids, recognition_db)
     
     # Time of last recognition attempt
     last_recognition_time = 0
@@ -158,85 +161,115 @@ def run_recognition_demo(database: PersonDatabase,
     # Last recognition results (for display consistency)
     last_results = {}
     
+    # Recently recognized faces, which are not recognized again
+    tracker = FaceTracker()
+    
+    # Every frame is decoded into the same buffer
+    frame = None
+    
+    # Static header text, drawn once and copied onto every frame
+    header = None
+    header_mask = None
+    
     while True:
-        ret, frame = cap.read()
+        ret, frame = read_latest_frame(cap, image=frame)
         
         if not ret:
             print("Error: Failed to capture image")
             break
             
-        # Detect faces
-        faces, metadata = detector.detect_faces(frame)
-        
-        # Create a copy for display
-        display_frame = frame.copy()
+        if header is None or header.shape != frame.shape:
+            header = np.zeros_like(frame)
+            cv2.putText(header, "Face Recognition Demo", 
+                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            header_mask = header.any(axis=2, keepdims=True)
+            
+        # Draw on the frame itself; recognition below is done with it
+        # before anything is drawn
+        display_frame = frame
         
-        # Perform recognition at specified intervals
+        # Perform detection and recognition at specified intervals; the
+        # display keeps showing the last results in between
         current_time = time.time()
-        if current_time - last_recognition_time >= recognition_interval and faces:
+        if current_time - last_recognition_time >= recognition_interval:
+            faces, metadata = detector.detect_faces(frame)
+        else:
+            faces = []
+            
+        if faces:
             last_recognition_time = current_time
             
             # Clear previous results
             last_results = {}
             
+            # Faces still where a recognized face was keep its identity; only
+            # the others are recognized, with one search of the embedding index
+            tracks = tracker.match([face_meta["bbox"] for face_meta in metadata])
+            new_faces = [i for i, track in enumerate(tracks) if track is None]
+            new_results = recognizer.recognize_faces_batch(
+                [faces[i] for i in new_faces], recognition_db
+            ) if new_faces else []
+            results = {i: (track["person_id"], track["similarity"], track["person_data"])
+                       for i, track in enumerate(tracks) if track is not None}
+            results.update(zip(new_faces, new_results))
+            
             # Process each detected face
-            for i, (face_img, face_meta) in enumerate(zip(faces, metadata)):
-                # Preprocess the face
-                face_img = preprocess_image_for_recognition(face_img)
-                
-                # Recognize face
-                person_id, similarity, person_data = recognizer.recognize_face_image(
-                    face_img, recognition_db
-                )
+            for i, face_meta in enumerate(metadata):
+                person_id, similarity, person_data = results[i]
                 
                 # Store result for this face
                 bbox = face_meta["bbox"]
+                if person_id != "unknown" and tracks[i] is None:
+                    tracker.add(bbox, person_id, similarity, person_data)
+                    
+                # Prepare the text to display once, not on every frame
+                if person_id != "unknown":
+                    name = person_data.get("name", "Unknown")
+                    relation = person_data.get("relation", "")
+                    notes = person_data.get("notes", "")
+                    label = f"{name} ({relation}) {similarity:.2f}"
+                    
+                    # Wrap text to fit on screen
+                    if notes:
+                        notes = notes[:50] + "..." if len(notes) > 50 else notes
+                else:
+                    label = "Unknown"
+                    notes = ""
+                    
                 last_results[i] = {
                     "bbox": bbox,
                     "person_id": person_id,
                     "similarity": similarity,
-                    "person_data": person_data
+                    "person_data": person_data,
+                    "label": label,
+                    "notes": notes
                 }
         
-        # Draw results on display frame
-        for face_idx, result in last_results.items():
-            bbox = result["bbox"]
-            person_id = result["person_id"]
-            similarity = result["similarity"]
-            person_data = result["person_data"]
+        # Draw all bounding boxes of a color with one call
+        known_boxes = []
+        unknown_boxes = []
+        for result in last_results.values():
+            x1, y1, x2, y2 = result["bbox"]
+            corners = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+            (known_boxes if result["person_id"] != "unknown" else unknown_boxes).append(corners)
             
-            # Draw bounding box
-            color = (0, 255, 0) if person_id != "unknown" else (0, 0, 255)
-            cv2.rectangle(display_frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
-            
-            # Prepare text to display
-            if person_id != "unknown":
-                name = person_data.get("name", "Unknown")
-                relation = person_data.get("relation", "")
-                notes = person_data.get("notes", "")
-                
-                # Draw name and relation
-                cv2.putText(display_frame, f"{name} ({relation})", 
-                           (bbox[0], bbox[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                
-                # Draw confidence
-                cv2.putText(display_frame, f"Conf: {similarity:.2f}", 
-                           (bbox[0], bbox[3] + 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+        for boxes, color in ((known_boxes, (0, 255, 0)), (unknown_boxes, (0, 0, 255))):
+            if boxes:
+                cv2.polylines(display_frame, np.array(boxes, dtype=np.int32), True, color, 2)
                 
-                # Draw notes if available
-                if notes:
-                    # Wrap text to fit on screen
-                    notes_short = notes[:50] + "..." if len(notes) > 50 else notes
-                    cv2.putText(display_frame, f"Notes: {notes_short}", 
-                               (10, display_frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            else:
-                # Draw unknown label
-                cv2.putText(display_frame, "Unknown", 
-                           (bbox[0], bbox[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        # Draw name, relation and confidence on one line, and notes if available
+        for result in last_results.values():
+            bbox = result["bbox"]
+            color = (0, 255, 0) if result["person_id"] != "unknown" else (0, 0, 255)
+            cv2.putText(display_frame, result["label"], 
+                       (bbox[0], bbox[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            
+            if result["notes"]:
+                cv2.putText(display_frame, f"Notes: {result['notes']}", 
+                           (10, display_frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
         
         # Display info
-        cv2.putText(display_frame, "Face Recognition Demo", 
-                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        np.copyto(display_frame, header, where=header_mask)
                 
         # Display the frame
         cv2.imshow("Face Recognition", display_frame)
@@ -0,0 +1,188 @@
+"""
+Binary storage for face embedding databases.
+
+Embeddings are kept in a single contiguous (N, D) matrix saved as .npy, which
+can be memory-mapped at load time. The JSON database file next to it holds the
+person records and the range of matrix rows belonging to each person, instead
+of the embeddings themselves.
+"""
+
+import os
+import json
+import numpy as np
+from pathlib import Path
+from typing import Dict, Any, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def read_json(path: Union[str, Path]) -> Any:
+    """
+    Read a JSON file, parsing it with orjson when it is installed.
+
+    Args:
+        path: Path of the JSON file
+
+    Returns:
+        Parsed JSON data
+    """
+    if orjson is not None:
+        return orjson.loads(Path(path).read_bytes())
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def write_json(data: Any, path: Union[str, Path]) -> None:
+    """
+    Write data as compact JSON, serializing it with orjson when it is installed.
+
+    Args:
+        data: JSON-serializable data
+        path: Path of the JSON file
+    """
+    if orjson is not None:
+        Path(path).write_bytes(orjson.dumps(data))
+        return
+
+    with open(path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+
+def embeddings_path(database_path: Union[str, Path]) -> Path:
+    """
+    Get the path of the embedding matrix of a database.
+
+    Args:
+        database_path: Path of the JSON database (e.g. data/face_database.json)
+
+    Returns:
+        Path of the embedding matrix (e.g. data/face_database.npy)
+    """
+    return Path(database_path).with_suffix(".npy")
+
+def _split_embeddings(database: Dict[str, Dict[str, Any]]) -> Tuple[np.ndarray, Dict[str, Dict[str, Any]]]:
+    """
+    Stack the embeddings of person records into one matrix.
+
+    Args:
+        database: Dictionary of person records with embeddings
+
+    Returns:
+        Tuple containing:
+        - Embedding matrix of shape (N, D)
+        - Person records without embeddings, each with the row_start and
+          row_end of its embeddings in the matrix
+    """
+    rows = []
+    persons = {}
+    row_start = 0
+
+    for person_id, person_data in database.items():
+        person_embeddings = person_data.get("embeddings", [])
+
+        if len(person_embeddings) > 0:
+            rows.append(np.asarray(person_embeddings, dtype=np.float32).reshape(len(person_embeddings), -1))
+
+        record = {key: value for key, value in person_data.items() if key != "embeddings"}
+        record["row_start"] = row_start
+        record["row_end"] = row_start + len(person_embeddings)
+        persons[person_id] = record
+        row_start = record["row_end"]
+
+    matrix = np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+    return matrix, persons
+
+def save_embedding_store(database: Dict[str, Dict[str, Any]],
+                         database_path: Union[str, Path]) -> int:
+    """
+    Save a database of person records as JSON plus an embedding matrix.
+
+    The JSON file at database_path holds the person records, each with the
+    range of matrix rows that holds its embeddings, and the name of the
+    matrix file. Embeddings are stored as float32, not normalized, so the
+    matrix can be searched memory-mapped as is. Persons without embeddings
+    are kept with an empty row range.
+
+    Args:
+        database: Dictionary of person records with embeddings
+        database_path: Path of the JSON database
+
+    Returns:
+        Number of embeddings written
+    """
+    database_path = Path(database_path)
+    matrix_path = embeddings_path(database_path)
+
+    matrix, persons = _split_embeddings(database)
+
+    database_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Write to temporary files and rename them into place, so readers that
+    # memory-mapped the previous matrix keep a valid file
+    with open(f"{matrix_path}.tmp", 'wb') as f:
+        np.save(f, matrix)
+    os.replace(f"{matrix_path}.tmp", matrix_path)
+
+    write_json({"embeddings": matrix_path.name, "persons": persons}, f"{database_path}.tmp")
+    os.replace(f"{database_path}.tmp", database_path)
+
+    return len(matrix)
+
+def load_embedding_store(database_path: Union[str, Path],
+                         mmap: bool = True) -> Tuple[np.ndarray, np.ndarray, Dict[str, Dict[str, Any]]]:
+    """
+    Load the embedding matrix and person records of a database.
+
+    Also reads JSON databases written by older versions, which store every
+    embedding as a list of floats; their matrix is built in memory.
+
+    Args:
+        database_path: Path of the JSON database
+        mmap: Whether to memory-map the matrix instead of reading it
+
+    Returns:
+        Tuple containing:
+        - Embedding matrix of shape (N, D), as stored (not normalized)
+        - Person ID for each row, shape (N,)
+        - Person records (without embeddings) keyed by person ID, each with
+          the row_start and row_end of its embeddings in the matrix
+    """
+    data = read_json(database_path)
+
+    if "embeddings" in data and "persons" in data:
+        persons = data["persons"]
+        matrix_path = Path(database_path).with_name(data["embeddings"])
+        matrix = np.load(matrix_path, mmap_mode='r' if mmap else None)
+    else:
+        # Older JSON database with the embeddings inline
+        matrix, persons = _split_embeddings(data)
+
+    owner_ids = np.empty(len(matrix), dtype=object)
+    for person_id, record in persons.items():
+        owner_ids[record["row_start"]:record["row_end"]] = person_id
+
+    return matrix, owner_ids, persons
+
+
+def load_person_records(database_path: Union[str, Path],
+                        mmap: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Load person records with their embeddings from either database format.
+
+    Args:
+        database_path: Path of the JSON database
+        mmap: Whether to memory-map the embedding matrix
+
+    Returns:
+        Person records keyed by person ID, each with a list of embeddings
+        (rows of the stored matrix)
+    """
+    matrix, _, persons = load_embedding_store(database_path, mmap=mmap)
+
+    for record in persons.values():
+        row_start = record.pop("row_start")
+        row_end = record.pop("row_end")
+        record["embeddings"] = list(matrix[row_start:row_end])
+
+    return persons
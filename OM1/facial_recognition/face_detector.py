@@ -6,30 +6,128 @@ Uses YOLOv8 for efficient real-time face detection.
 import os
 import cv2
 import numpy as np
+import torch
+import torch.nn.functional as F
 from pathlib import Path
 from ultralytics import YOLO
+from ultralytics.utils import ops
 from typing import List, Tuple, Dict, Any, Optional
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Margin added around each detected face when cropping, as a fraction of
+# the box size
+CROP_MARGIN = 0.1
+
+# IoU threshold of the non-maximum suppression (the Ultralytics default)
+NMS_IOU = 0.7
+
+# Padding value of letterboxed inputs (the Ultralytics default)
+LETTERBOX_FILL = 114 / 255
+
+# Exported models made by setup.py, next to model.pt, per inference backend
+EXPORTED_MODELS = {
+    "tensorrt": "model.engine",
+    "openvino": "model_openvino_model",
+}
+
+if njit is not None:
+    # A plain loop rather than prange: a frame holds a handful of faces, far
+    # too few to pay for starting the parallel workers
+    @njit(cache=True, fastmath=True)
+    def _box_geometry(boxes, width, height, margin):
+        """
+        Convert (N, 4) float boxes to an (N, 10) int32 array of the integer
+        box, its center, and the box expanded by a margin and clipped to the
+        image.
+        """
+        out = np.empty((boxes.shape[0], 10), dtype=np.int32)
+        for i in range(boxes.shape[0]):
+            x1, y1 = int(boxes[i, 0]), int(boxes[i, 1])
+            x2, y2 = int(boxes[i, 2]), int(boxes[i, 3])
+            margin_x = int((x2 - x1) * margin)
+            margin_y = int((y2 - y1) * margin)
+            out[i, 0] = x1
+            out[i, 1] = y1
+            out[i, 2] = x2
+            out[i, 3] = y2
+            out[i, 4] = (x1 + x2) // 2
+            out[i, 5] = (y1 + y2) // 2
+            out[i, 6] = max(0, x1 - margin_x)
+            out[i, 7] = max(0, y1 - margin_y)
+            out[i, 8] = min(width, x2 + margin_x)
+            out[i, 9] = min(height, y2 + margin_y)
+        return out
+else:
+    def _box_geometry(boxes, width, height, margin):
+        """
+        Convert (N, 4) float boxes to an (N, 10) int32 array of the integer
+        box, its center, and the box expanded by a margin and clipped to the
+        image.
+        """
+        boxes = boxes.astype(np.int32)
+        centers = (boxes[:, :2] + boxes[:, 2:]) // 2
+        margins = ((boxes[:, 2:] - boxes[:, :2]) * margin).astype(np.int32)
+        top_left = np.maximum(boxes[:, :2] - margins, 0)
+        bottom_right = np.minimum(boxes[:, 2:] + margins, (width, height))
+        return np.hstack([boxes, centers, top_left, bottom_right]).astype(np.int32)
+
 class FaceDetector:
     """Face detector using YOLOv8 for real-time detection."""
     
     def __init__(self, 
                  model_path: Optional[str] = None,
                  confidence: float = 0.5,
-                 device: str = "auto"):
+                 device: str = "auto",
+                 image_size: int = 640,
+                 num_threads: Optional[int] = None,
+                 gpu_preprocess: bool = True,
+                 backend: str = "auto"):
         """
         Initialize the face detector.
         
         Args:
             model_path: Path to the YOLOv8 face detection model.
-                        If None, will prioritize using local model.pt in the same directory.
+                        If None, will prioritize using local model.pt in the same directory,
+                        or the TensorRT/OpenVINO export of it made by setup.py.
             confidence: Confidence threshold for detections (0.0 to 1.0)
             device: Device to run inference on ('cpu', 'cuda', or 'auto')
+            image_size: Fixed inference size, so every frame is letterboxed
+                        to the same input shape
+            num_threads: Number of Torch CPU threads. None keeps Torch's
+                         defaults; pass a share of the cores when the
+                         recognizer runs in the same process
+            gpu_preprocess: Whether to letterbox frames on the GPU and call
+                            the network directly when running on CUDA,
+                            instead of Ultralytics' CPU preprocessing
+            backend: Inference backend ('tensorrt', 'openvino', 'pytorch', or
+                     'auto' for TensorRT on CUDA and OpenVINO on the CPU,
+                     falling back to PyTorch when no export exists)
         """
-        # Always try to use local model.pt first
-        local_model_path = os.path.join(os.path.dirname(__file__), 'model.pt')
+        if backend not in ("auto", "pytorch", *EXPORTED_MODELS):
+            raise ValueError(f"Unsupported backend: {backend}")
+            
+        self._configure_threads(num_threads)
+        
+        if device == "auto":
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        if backend == "auto":
+            backend = "tensorrt" if device != "cpu" else "openvino"
         
-        if os.path.exists(local_model_path):
+        # Always try to use local model.pt first, preferring a TensorRT engine
+        # on NVIDIA GPUs or an OpenVINO model elsewhere when one was exported
+        local_model_path = os.path.join(os.path.dirname(__file__), 'model.pt')
+        exported_model_path = None
+        if backend in EXPORTED_MODELS:
+            exported_model_path = os.path.join(os.path.dirname(__file__), EXPORTED_MODELS[backend])
+            
+        if exported_model_path is not None and os.path.exists(exported_model_path):
+            print(f"Using exported model: {exported_model_path}")
+            self.model = YOLO(exported_model_path, task='detect')
+        elif os.path.exists(local_model_path):
             print(f"Using local model: {local_model_path}")
             self.model = YOLO(local_model_path)
         elif model_path is not None:
@@ -41,8 +139,68 @@ class FaceDetector:
             self.model = YOLO('yolov8n-face.pt')
             
         self.confidence = confidence
+        self.image_size = image_size
         self.device = device
         
+        # Run in half precision on the GPU, and let cuDNN pick the fastest
+        # kernels for the fixed input size
+        self._half = self.device != "cpu" and torch.cuda.is_available()
+        if self._half:
+            torch.backends.cudnn.benchmark = True
+        
+        # Warm up once so the first real frame does not pay for model setup;
+        # this also creates the predictor used by the GPU path
+        self._gpu_preprocess = False
+        self.detect_faces_batch([np.zeros((image_size, image_size, 3), dtype=np.uint8)],
+                                return_cropped=False)
+        
+        # Letterboxed batch on the GPU, pinned host buffers per frame shape
+        # and a side stream for the uploads, allocated on first use
+        self._gpu_preprocess = gpu_preprocess and self._half
+        self._input = None
+        self._pinned = {}
+        self._stream = torch.cuda.Stream() if self._gpu_preprocess else None
+        
+    @staticmethod
+    def _configure_threads(num_threads: Optional[int] = None):
+        """
+        Limit the Torch thread pools so the detector does not oversubscribe
+        the CPU cores shared with the recognizer.
+        
+        Torch's thread pools are process-wide, so they are left at their
+        defaults unless a thread count is given.
+        
+        Args:
+            num_threads: Number of intra-op threads (None keeps Torch's defaults)
+        """
+        if num_threads is None:
+            return
+            
+        torch.set_num_threads(num_threads)
+        
+        # Can only be set once, before Torch runs any parallel work
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+        
+    def warmup(self, 
+               image_shape: Tuple[int, int, int] = (480, 640, 3), 
+               batch_size: int = 1, 
+               runs: int = 2):
+        """
+        Run the detector on blank frames so kernel selection and buffer
+        allocation for this input shape happen before the first real frame.
+        
+        Args:
+            image_shape: Shape of the frames that will be detected
+            batch_size: Number of frames per detection call
+            runs: Number of warm-up calls (the first one pays the setup cost)
+        """
+        images = [np.zeros(image_shape, dtype=np.uint8)] * batch_size
+        for _ in range(runs):
+            self.detect_faces_batch(images, return_cropped=False)
+        
     def detect_faces(self, 
                     image: np.ndarray, 
                     return_cropped: bool = True) -> Tuple[List[np.ndarray], List[Dict[str, Any]]]:
@@ -58,51 +216,153 @@ class FaceDetector:
             - List of cropped face images (if return_cropped=True)
             - List of detection metadata (bounding boxes, confidence, etc.)
         """
-        # Run inference with model
-        results = self.model(image, conf=self.confidence, verbose=False)
+        return self.detect_faces_batch([image], return_cropped)[0]
+    
+    def detect_faces_batch(self, 
+                          images: List[np.ndarray], 
+                          return_cropped: bool = True) -> List[Tuple[List[np.ndarray], List[Dict[str, Any]]]]:
+        """
+        Detect faces in several images with a single model call.
         
-        faces = []
-        metadata = []
+        Args:
+            images: Input images (BGR format from OpenCV), e.g. frames from
+                    several cameras or consecutive frames from one camera
+            return_cropped: Whether to return cropped face images
+            
+        Returns:
+            List with one (faces, metadata) tuple per image, as returned by detect_faces
+        """
+        if len(images) == 0:
+            return []
+            
+        if self._gpu_preprocess:
+            detections = self._detect_gpu(images)
+        else:
+            # Run inference on the whole batch at once
+            results = self.model(list(images), 
+                                 conf=self.confidence, 
+                                 device=self.device, 
+                                 half=self._half, 
+                                 imgsz=self.image_size, 
+                                 verbose=False)
+            detections = [(result.boxes.xyxy.cpu().numpy(), result.boxes.conf.cpu().numpy())
+                          for result in results]
         
-        # Process each detection
-        for result in results:
-            boxes = result.boxes
+        return [self._parse_detections(image, xyxy, confidences, return_cropped)
+                for image, (xyxy, confidences) in zip(images, detections)]
+    
+    @torch.inference_mode()
+    def _detect_gpu(self, images: List[np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Letterbox images on the GPU and run the network on them directly,
+        skipping Ultralytics' host-side preprocessing.
+        
+        Args:
+            images: Input images (BGR format from OpenCV)
             
-            for i, box in enumerate(boxes):
-                # Get bounding box coordinates (convert to integers)
-                x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                
-                # Get confidence score
-                conf = float(box.conf[0])
+        Returns:
+            List with one (boxes, confidences) tuple per image, boxes as
+            (N, 4) x1, y1, x2, y2 in image coordinates
+        """
+        network = self.model.predictor.model
+        size = self.image_size
+        
+        if self._input is None or len(self._input) < len(images):
+            dtype = torch.float16 if network.fp16 else torch.float32
+            self._input = torch.empty((len(images), 3, size, size), dtype=dtype, device=self.device)
+        batch = self._input[:len(images)]
+        
+        transforms = []
+        self._stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(self._stream):
+            batch.fill_(LETTERBOX_FILL)
+            
+            for i, image in enumerate(images):
+                # Upload the raw uint8 frame from pinned memory, one buffer
+                # per batch slot so pending copies are never overwritten
+                pinned = self._pinned.get((i, image.shape))
+                if pinned is None:
+                    pinned = torch.empty(image.shape, dtype=torch.uint8).pin_memory()
+                    self._pinned[(i, image.shape)] = pinned
+                pinned.numpy()[...] = image
+                frame = pinned.to(self.device, non_blocking=True)
                 
-                # Create metadata dictionary
-                face_meta = {
-                    "bbox": (x1, y1, x2, y2),
-                    "confidence": conf,
-                    "center": ((x1 + x2) // 2, (y1 + y2) // 2)
-                }
+                # HWC BGR uint8 -> 1CHW RGB in [0, 1], resized into the
+                # center of the square input
+                height, width = image.shape[:2]
+                gain = min(size / height, size / width)
+                new_height, new_width = round(height * gain), round(width * gain)
+                top, left = (size - new_height) // 2, (size - new_width) // 2
                 
-                metadata.append(face_meta)
+                frame = frame.permute(2, 0, 1).flip(0).unsqueeze(0).to(batch.dtype) / 255
+                batch[i:i + 1, :, top:top + new_height, left:left + new_width] = F.interpolate(
+                    frame, size=(new_height, new_width), mode="bilinear", align_corners=False)
+                transforms.append((gain, left, top, width, height))
                 
-                # Crop face if requested
-                if return_cropped:
-                    # Add some margin to the crop for better recognition
-                    margin_x = int((x2 - x1) * 0.1)
-                    margin_y = int((y2 - y1) * 0.1)
-                    
-                    # Ensure we don't go out of image bounds
-                    crop_x1 = max(0, x1 - margin_x)
-                    crop_y1 = max(0, y1 - margin_y)
-                    crop_x2 = min(image.shape[1], x2 + margin_x)
-                    crop_y2 = min(image.shape[0], y2 + margin_y)
-                    
-                    face_img = image[crop_y1:crop_y2, crop_x1:crop_x2]
-                    faces.append(face_img)
+            predictions = ops.non_max_suppression(network(batch), self.confidence, NMS_IOU)
+        self._stream.synchronize()
+        
+        detections = []
+        for (gain, left, top, width, height), prediction in zip(transforms, predictions):
+            # Map boxes from the letterboxed input back into the image
+            prediction = prediction.float().cpu().numpy()
+            xyxy = (prediction[:, :4] - (left, top, left, top)) / gain
+            xyxy = np.clip(xyxy, 0, (width, height, width, height))
+            detections.append((xyxy, prediction[:, 4]))
+            
+        return detections
+    
+    def _parse_detections(self, 
+                         image: np.ndarray, 
+                         xyxy: np.ndarray, 
+                         confidences: np.ndarray, 
+                         return_cropped: bool) -> Tuple[List[np.ndarray], List[Dict[str, Any]]]:
+        """
+        Convert the detections for one image into face crops and metadata.
+        
+        Args:
+            image: Image the detections belong to
+            xyxy: Bounding boxes of shape (N, 4) as x1, y1, x2, y2
+            confidences: Confidence score of each box, shape (N,)
+            return_cropped: Whether to return cropped face images
+            
+        Returns:
+            Tuple containing:
+            - List of cropped face images (if return_cropped=True)
+            - List of detection metadata (bounding boxes, confidence, etc.)
+        """
+        faces = []
+        metadata = []
+        
+        # Convert all boxes of the image at once instead of box by box
+        xyxy = np.ascontiguousarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        confidences = np.asarray(confidences, dtype=np.float32).tolist()
+        
+        # Integer boxes, centers and crop regions with some margin for better
+        # recognition, clipped to the image bounds
+        geometry = _box_geometry(xyxy, image.shape[1], image.shape[0], CROP_MARGIN)
+        
+        # Process each detection
+        for (x1, y1, x2, y2, center_x, center_y, 
+             crop_x1, crop_y1, crop_x2, crop_y2), conf in zip(geometry.tolist(), confidences):
+            # Create metadata dictionary
+            face_meta = {
+                "bbox": (x1, y1, x2, y2),
+                "confidence": conf,
+                "center": (center_x, center_y)
+            }
+            
+            metadata.append(face_meta)
+            
+            # Crop face if requested
+            if return_cropped:
+                faces.append(image[crop_y1:crop_y2, crop_x1:crop_x2])
         
         return faces, metadata
     
     def detect_faces_and_draw(self, 
                              image: np.ndarray, 
+                             metadata: Optional[List[Dict[str, Any]]] = None,
                              color: Tuple[int, int, int] = (0, 255, 0),
                              thickness: int = 2,
                              draw_confidence: bool = True) -> np.ndarray:
@@ -111,6 +371,8 @@ class FaceDetector:
         
         Args:
             image: Input image (BGR format)
+            metadata: Detection metadata already computed for this image by
+                      detect_faces (optional; faces are detected if omitted)
             color: Bounding box color (BGR format)
             thickness: Bounding box thickness
             draw_confidence: Whether to draw confidence scores
@@ -118,11 +380,33 @@ class FaceDetector:
         Returns:
             Image with drawn bounding boxes
         """
-        # Create a copy of the image
-        output_img = image.copy()
+        # Detect faces unless the caller already did
+        if metadata is None:
+            _, metadata = self.detect_faces(image, return_cropped=False)
         
-        # Detect faces
-        _, metadata = self.detect_faces(image, return_cropped=False)
+        return self.draw(image.copy(), metadata, color, thickness, draw_confidence)
+    
+    @staticmethod
+    def draw(image: np.ndarray, 
+             metadata: List[Dict[str, Any]], 
+             color: Tuple[int, int, int] = (0, 255, 0),
+             thickness: int = 2,
+             draw_confidence: bool = True) -> np.ndarray:
+        """
+        Draw detected bounding boxes onto an image in place, without
+        running detection.
+        
+        Args:
+            image: Image to draw on (BGR format)
+            metadata: Detection metadata from detect_faces
+            color: Bounding box color (BGR format)
+            thickness: Bounding box thickness
+            draw_confidence: Whether to draw confidence scores
+            
+        Returns:
+            The same image, with drawn bounding boxes
+        """
+        output_img = image
         
         # Draw bounding boxes
         for face in metadata:
@@ -10,7 +10,63 @@ from typing import List, Dict, Any, Tuple, Optional, Union
 from pathlib import Path
 import json
 from deepface import DeepFace
-from sklearn.metrics.pairwise import cosine_similarity
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+# Execution providers tried in order when running an exported ONNX model
+ONNX_PROVIDERS = ["TensorrtExecutionProvider", "CUDAExecutionProvider", "CPUExecutionProvider"]
+
+# Rows of int8 codes converted to float at a time when searching without Faiss
+INT8_BLOCK_ROWS = 16384
+
+def int8_model_path(onnx_path: str) -> str:
+    """
+    Get the path of the int8-quantized version of an ONNX model
+    (see export_onnx.py --int8), e.g. models/facenet_int8.onnx.
+    """
+    base, ext = os.path.splitext(onnx_path)
+    return f"{base}_int8{ext}"
+
+def int8_model_is_faster(onnx_path: str) -> bool:
+    """
+    Check whether the int8 version of an ONNX model exists and ran faster
+    than the float model when export_onnx.py measured both, as recorded in
+    e.g. models/facenet_int8.json.
+    """
+    if not os.path.exists(int8_model_path(onnx_path)):
+        return False
+        
+    try:
+        with open(f"{os.path.splitext(onnx_path)[0]}_int8.json") as f:
+            latency = json.load(f)
+        return latency["int8_ms"] < latency["float_ms"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetrically quantize each row of a matrix to int8.
+    
+    Args:
+        matrix: Float matrix of shape (N, D)
+        
+    Returns:
+        Tuple containing:
+        - Int8 codes of shape (N, D)
+        - Scale per row, shape (N,), so that row ~= codes * scale
+    """
+    scales = np.abs(matrix).max(axis=1).astype(np.float32) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(matrix / scales[:, np.newaxis]).astype(np.int8)
+    return codes, scales
 
 class FaceRecognizer:
     """Face recognition system using DeepFace and FaceNet embeddings."""
@@ -19,7 +75,12 @@ class FaceRecognizer:
                  model_name: str = "Facenet",
                  distance_metric: str = "cosine",
                  recognition_threshold: float = 0.6,
-                 enforce_detection: bool = False):
+                 enforce_detection: bool = False,
+                 ivfpq_threshold: int = 10000,
+                 quantization: Optional[str] = None,
+                 onnx_path: Optional[str] = None,
+                 device: str = "auto",
+                 num_threads: Optional[int] = None):
         """
         Initialize face recognition system.
         
@@ -27,12 +88,211 @@ class FaceRecognizer:
             model_name: Model to use for face recognition (e.g., "Facenet", "ArcFace")
             distance_metric: Distance metric for similarity ("cosine", "euclidean", etc.)
             recognition_threshold: Threshold for recognition (lower is more strict)
-            enforce_detection: Whether to enforce face detection in DeepFace
+            enforce_detection: Whether to enforce face detection in DeepFace.
+                               Unused when embedding, since faces are cropped
+                               by the detector before reaching the recognizer.
+            ivfpq_threshold: Number of stored embeddings from which a compressed
+                             Faiss IVFPQ index is used instead of an exact one
+            quantization: Compression of the stored embeddings. None keeps
+                          float32, "int8" stores 8-bit codes (4x smaller) and
+                          "pq" stores 32-byte product-quantized codes (needs
+                          Faiss). Quantized rows replace the float matrix
+            onnx_path: Optional ONNX export of the model (see export_onnx.py),
+                       run with ONNX Runtime on TensorRT/CUDA when available.
+                       On the CPU its int8-quantized version is used instead
+                       when one was exported next to it and measured faster
+            device: Device to run the embedding model on ('auto' or 'cpu').
+                    'cpu' keeps the model off the GPU, e.g. when the
+                    detector already uses it
+            num_threads: Number of CPU threads of the embedding model. None
+                         keeps the runtime's default; pass a share of the
+                         cores when the detector runs in the same process
         """
+        if quantization not in (None, "int8", "pq"):
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        if quantization == "pq" and faiss is None:
+            raise ValueError("Quantization 'pq' requires faiss")
+            
         self.model_name = model_name
         self.distance_metric = distance_metric
         self.recognition_threshold = recognition_threshold
         self.enforce_detection = enforce_detection
+        self.ivfpq_threshold = ivfpq_threshold
+        self.quantization = quantization
+        
+        # Structure-of-arrays view of the database used for recognition
+        self._database = None
+        self._matrix = None
+        self._inv_norms = None
+        self._owner_ids = None
+        self._index = None
+        self._matrix_q = None
+        self._row_scales = None
+        
+        self._model = None
+        self._session = None
+        
+        if onnx_path is not None and ort is None:
+            print("Warning: onnxruntime not installed, falling back to DeepFace")
+            
+        if onnx_path is not None and ort is not None:
+            available = ort.get_available_providers()
+            providers = [provider for provider in ONNX_PROVIDERS if provider in available]
+            if device == "cpu":
+                providers = ["CPUExecutionProvider"]
+                
+            # Int8 kernels can speed up CPU inference (VNNI / dot-product
+            # instructions), but not on every CPU, so the int8 model is only
+            # used where it was measured faster; GPU providers keep the float model
+            if providers == ["CPUExecutionProvider"] and int8_model_is_faster(onnx_path):
+                onnx_path = int8_model_path(onnx_path)
+                
+            # Run operators one at a time, on a fixed number of threads
+            # if one was given
+            options = ort.SessionOptions()
+            if num_threads is not None:
+                options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+            options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._session = ort.InferenceSession(onnx_path, sess_options=options, providers=providers)
+            
+            # Keras exports keep the NHWC input layout: (batch, height, width, 3)
+            model_input = self._session.get_inputs()[0]
+            self._input_name = model_input.name
+            self._input_shape = (model_input.shape[2], model_input.shape[1])
+            print(f"Loaded ONNX model {onnx_path} with providers {self._session.get_providers()}")
+        else:
+            self._configure_tensorflow(device, num_threads)
+            
+            # Load the embedding model once instead of on every DeepFace.represent call
+            self._model = DeepFace.build_model(self.model_name)
+            self._input_shape = tuple(self._model.input_shape)
+        
+    @staticmethod
+    def _configure_tensorflow(device: str, num_threads: Optional[int]):
+        """
+        Limit the TensorFlow thread pools used by DeepFace and optionally
+        hide the GPUs from it.
+        
+        Args:
+            device: 'cpu' to keep TensorFlow off the GPU, 'auto' otherwise
+            num_threads: Number of intra-op threads (None keeps TensorFlow's
+                         defaults)
+        """
+        import tensorflow as tf
+        
+        # These settings are rejected once TensorFlow has been initialized,
+        # e.g. by an earlier FaceRecognizer in the same process
+        try:
+            if num_threads is not None:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+                tf.config.threading.set_inter_op_parallelism_threads(1)
+            if device == "cpu":
+                tf.config.set_visible_devices([], "GPU")
+        except RuntimeError as e:
+            print(f"Warning: Could not configure TensorFlow: {str(e)}")
+        
+    def _prepare_face(self, face_img: np.ndarray) -> np.ndarray:
+        """
+        Resize and scale a cropped face to the model input format.
+        
+        This is the only image conversion on the recognition path. Faces stay
+        BGR, which is the channel order DeepFace feeds its models, so no
+        color conversion is needed for color input.
+        
+        Args:
+            face_img: Face image (BGR format)
+            
+        Returns:
+            Float32 array of the model input size with values in [0, 1]
+        """
+        if face_img.ndim == 2:
+            face_img = cv2.cvtColor(face_img, cv2.COLOR_GRAY2BGR)
+            
+        face = cv2.resize(face_img, self._input_shape)
+        
+        # Convert and scale in one pass
+        return np.multiply(face, np.float32(1.0 / 255.0), dtype=np.float32)
+        
+    def _prepare_stack(self, face_stack: np.ndarray) -> np.ndarray:
+        """
+        Prepare a stack of same-sized faces, e.g. the augmentations of one
+        face, with a single resize and a single scaling pass.
+        
+        Args:
+            face_stack: Face images of shape (K, H, W, 3) (BGR format)
+            
+        Returns:
+            Float32 array of shape (K, model height, model width, 3) with
+            values in [0, 1]
+        """
+        count, height, width, channels = face_stack.shape
+        
+        # Resize all faces at once as one image with K * 3 channels
+        # (OpenCV supports up to 512 channels)
+        if count * channels > 512:
+            return np.stack([self._prepare_face(face) for face in face_stack])
+            
+        planes = face_stack.transpose(1, 2, 0, 3).reshape(height, width, count * channels)
+        resized = cv2.resize(planes, self._input_shape)
+        resized = resized.reshape(resized.shape[0], resized.shape[1], count, channels).transpose(2, 0, 1, 3)
+        
+        return np.multiply(resized, np.float32(1.0 / 255.0), dtype=np.float32)
+        
+    def _forward(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Run the embedding model on a batch of prepared faces.
+        
+        Args:
+            batch: Prepared faces of shape (K, H, W, 3)
+            
+        Returns:
+            Embeddings of shape (K, D)
+        """
+        if self._session is not None:
+            embeddings = self._session.run(None, {self._input_name: batch})[0]
+            return np.asarray(embeddings, dtype=np.float32).reshape(len(batch), -1)
+            
+        embeddings = np.asarray(self._model.forward(batch), dtype=np.float32)
+        
+        if embeddings.ndim == 1 and len(batch) > 1:
+            # Older DeepFace releases only return the first embedding of a batch
+            return np.stack([self._forward(face[np.newaxis])[0] for face in batch])
+            
+        return embeddings.reshape(len(batch), -1)
+        
+    def warmup(self, batch_size: int = 1, runs: int = 2):
+        """
+        Run the embedding model on blank faces so graph tracing and
+        weight upload happen before the first real face.
+        
+        Args:
+            batch_size: Number of faces per forward pass
+            runs: Number of warm-up passes (the first one pays the setup cost)
+        """
+        width, height = self._input_shape
+        batch = np.zeros((batch_size, height, width, 3), dtype=np.float32)
+        for _ in range(runs):
+            self._forward(batch)
+        
+    def preprocess_and_embed(self, face_bgr: np.ndarray) -> np.ndarray:
+        """
+        Prepare a raw BGR face crop and compute its embedding.
+        
+        Callers should pass the crop straight from the detector; extra
+        preprocessing such as preprocess_image_for_recognition changes the
+        embedding and is only meant for offline augmentation.
+        
+        Args:
+            face_bgr: Face image (BGR format)
+            
+        Returns:
+            Embedding vector as numpy array
+        """
+        # The face is already cropped, so skip DeepFace's detector and
+        # call the cached model directly
+        return self._forward(self._prepare_face(face_bgr)[np.newaxis])[0]
         
     def generate_embedding(self, face_img: np.ndarray) -> np.ndarray:
         """
@@ -45,31 +305,201 @@ class FaceRecognizer:
             Embedding vector as numpy array
         """
         try:
-            # Generate embedding using DeepFace
-            embedding_obj = DeepFace.represent(
-                img_path=face_img,
-                model_name=self.model_name,
-                enforce_detection=self.enforce_detection
-            )
-            
-            # Extract the embedding vector
-            embedding = np.array(embedding_obj[0]["embedding"])
-            return embedding
+            return self.preprocess_and_embed(face_img)
             
         except Exception as e:
             print(f"Error generating embedding: {str(e)}")
             # Return empty embedding in case of error
             return np.array([])
+            
+    def generate_embeddings_batch(self, face_imgs: List[np.ndarray]) -> np.ndarray:
+        """
+        Generate embeddings for several face images in one forward pass.
+        
+        Args:
+            face_imgs: List of face images (BGR format), or a (K, H, W, 3)
+                       array of same-sized faces such as Augmenter output
+            
+        Returns:
+            Embedding matrix of shape (K, D), or an empty array on error
+        """
+        if len(face_imgs) == 0:
+            return np.array([])
+            
+        try:
+            if isinstance(face_imgs, np.ndarray) and face_imgs.ndim == 4:
+                batch = self._prepare_stack(face_imgs)
+            else:
+                batch = np.stack([self._prepare_face(face_img) for face_img in face_imgs])
+            return self._forward(batch)
+            
+        except Exception as e:
+            print(f"Error generating embeddings: {str(e)}")
+            return np.array([])
+        
+    def set_database(self, database: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Build the recognition matrix from a database of person records.
+        
+        All embeddings are stacked into a single contiguous (N, D) float32
+        matrix, together with a parallel array mapping each row to its person
+        ID. A query then reduces to one matrix-vector product scaled by the
+        inverse row norms, or to a Faiss inner-product search over normalized
+        rows when faiss is installed.
+        Call this again if the database is modified in place.
+        
+        Args:
+            database: Dictionary of person records with embeddings
+        """
+        rows = []
+        owner_ids = []
+        
+        for person_id, person_data in database.items():
+            person_embeddings = person_data.get("embeddings", [])
+            
+            if len(person_embeddings) == 0:
+                continue
+                
+            rows.append(np.asarray(person_embeddings, dtype=np.float32).reshape(len(person_embeddings), -1))
+            owner_ids.extend([person_id] * len(person_embeddings))
+        
+        if not rows:
+            self.set_embeddings(np.zeros((0, 0), dtype=np.float32), np.array([]), database)
+            return
+            
+        self.set_embeddings(np.vstack(rows), np.array(owner_ids), database)
+        
+    def set_embeddings(self, 
+                       matrix: np.ndarray, 
+                       owner_ids: np.ndarray, 
+                       persons: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Use a prebuilt embedding matrix for recognition.
+        
+        Rows do not need to be normalized: similarities are scaled by the
+        inverse row norms instead, so a memory-mapped float32 matrix (see
+        embedding_store) is not copied into memory here.
+        
+        Args:
+            matrix: Embedding matrix of shape (N, D)
+            owner_ids: Person ID for each row of the matrix, shape (N,)
+            persons: Person records keyed by person ID
+        """
+        self._database = persons
+        
+        if len(matrix) == 0:
+            self._matrix = None
+            self._inv_norms = None
+            self._owner_ids = None
+            self._index = None
+            self._matrix_q = None
+            self._row_scales = None
+            return
+            
+        self._matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self._owner_ids = np.asarray(owner_ids)
+        
+        norms = np.linalg.norm(self._matrix, axis=1)
+        norms[norms == 0] = 1.0
+        if np.allclose(norms, 1.0, atol=1e-3):
+            self._inv_norms = None
+            normalized = self._matrix
+        else:
+            self._inv_norms = (1.0 / norms).astype(np.float32)
+            normalized = self._matrix * self._inv_norms[:, np.newaxis]
+            
+        self._index = self._build_index(normalized) if faiss is not None else None
+        
+        # Without Faiss, int8 search runs on quantized rows with per-row scales
+        if self._index is None and self.quantization is not None:
+            self._matrix_q, self._row_scales = quantize_int8(normalized)
+        else:
+            self._matrix_q, self._row_scales = None, None
+            
+        # Quantized search never reads the float rows, so do not keep them
+        if self.quantization is not None:
+            self._matrix = self._inv_norms = None
+        
+    def _build_index(self, matrix: np.ndarray):
+        """
+        Build a Faiss inner-product index over normalized embeddings.
+        
+        Small databases use an exact IndexFlatIP. Large ones use an IVFPQ
+        index, which only scans a few inverted lists and stores compressed
+        vectors. With quantization enabled, "int8" uses an 8-bit scalar
+        quantizer and "pq" an IVFPQ index (PQ32x8) regardless of size.
+        
+        Args:
+            matrix: L2-normalized embedding matrix of shape (N, D)
+            
+        Returns:
+            Faiss index containing all rows of the matrix
+        """
+        dim = matrix.shape[1]
+        
+        # PQ with 8-bit codes needs at least 256 training vectors
+        if self.quantization == "pq" and len(matrix) >= 256 and dim % 32 == 0:
+            nlist = max(1, min(64, len(matrix) // 39))
+            index = faiss.index_factory(dim, f"IVF{nlist},PQ32x8", faiss.METRIC_INNER_PRODUCT)
+            index.train(matrix)
+            index.nprobe = min(16, nlist)
+        elif self.quantization is not None:
+            index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit,
+                                               faiss.METRIC_INNER_PRODUCT)
+            index.train(matrix)
+        elif len(matrix) >= self.ivfpq_threshold and dim % 32 == 0:
+            index = faiss.index_factory(dim, "IVF256,PQ32x8", faiss.METRIC_INNER_PRODUCT)
+            index.train(matrix)
+            index.nprobe = 16
+        else:
+            index = faiss.IndexFlatIP(dim)
+            
+        index.add(matrix)
+        return index
+        
+    def _search(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the most similar stored embedding for each query.
+        
+        Args:
+            queries: L2-normalized query embeddings of shape (K, D)
+            
+        Returns:
+            Tuple containing:
+            - Best similarity per query, shape (K,)
+            - Matching row in the embedding matrix per query (-1 if none), shape (K,)
+        """
+        if self._index is not None:
+            scores, rows = self._index.search(queries, 1)
+            return scores[:, 0], rows[:, 0]
+            
+        if self._matrix_q is not None:
+            # NumPy has no fast integer matrix product, so convert the codes
+            # back to float a block at a time for SGEMM
+            similarities = np.empty((len(queries), len(self._matrix_q)), dtype=np.float32)
+            for start in range(0, len(self._matrix_q), INT8_BLOCK_ROWS):
+                block = self._matrix_q[start:start + INT8_BLOCK_ROWS].astype(np.float32)
+                similarities[:, start:start + len(block)] = queries @ block.T
+            similarities *= self._row_scales
+            rows = similarities.argmax(axis=1)
+            return similarities[np.arange(len(queries)), rows], rows
+            
+        similarities = queries @ self._matrix.T
+        if self._inv_norms is not None:
+            similarities *= self._inv_norms
+        rows = similarities.argmax(axis=1)
+        return similarities[np.arange(len(queries)), rows], rows
         
     def recognize_face(self, 
                        face_embedding: np.ndarray, 
-                       database: Dict[str, Dict[str, Any]]) -> Tuple[str, float, Dict[str, Any]]:
+                       database: Optional[Dict[str, Dict[str, Any]]] = None) -> Tuple[str, float, Dict[str, Any]]:
         """
         Recognize a face by comparing its embedding with the database.
         
         Args:
             face_embedding: Embedding vector of the query face
-            database: Dictionary of person records with embeddings
+            database: Dictionary of person records with embeddings. If omitted,
+                      the database from the last call to set_database is used.
             
         Returns:
             Tuple containing:
@@ -77,53 +507,64 @@ class FaceRecognizer:
             - Similarity score
             - Person record from database (or empty dict)
         """
-        if len(face_embedding) == 0 or not database:
+        if len(face_embedding) == 0:
             return "unknown", 0.0, {}
+            
+        return self.recognize_embeddings(np.asarray(face_embedding).reshape(1, -1), database)[0]
         
-        max_similarity = -1
-        recognized_id = "unknown"
-        person_record = {}
+    def recognize_embeddings(self, 
+                             embeddings: np.ndarray, 
+                             database: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Recognize several faces at once from their embeddings.
         
-        # Compare with each person in the database
-        for person_id, person_data in database.items():
-            # Get all embeddings for this person
-            person_embeddings = person_data.get("embeddings", [])
+        Args:
+            embeddings: Embedding matrix of shape (K, D)
+            database: Dictionary of person records with embeddings (optional,
+                      see recognize_face)
             
-            if not person_embeddings:
-                continue
+        Returns:
+            List of (person ID, similarity, person record) tuples, one per row
+        """
+        if database is not None and database is not self._database:
+            self.set_database(database)
+            
+        if self._owner_ids is None:
+            return [("unknown", 0.0, {}) for _ in range(len(embeddings))]
+        
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        valid = norms[:, 0] > 0
+        norms[~valid] = 1.0
+        
+        # Cosine similarity against every stored embedding in one pass
+        scores, rows = self._search(np.ascontiguousarray(queries / norms))
+        
+        results = []
+        for is_valid, score, row in zip(valid, scores, rows):
+            max_similarity = float(score)
+            
+            if not is_valid:
+                results.append(("unknown", 0.0, {}))
+            elif row < 0 or max_similarity < self.recognition_threshold:
+                # Return unknown if similarity is below threshold
+                results.append(("unknown", max_similarity, {}))
+            else:
+                recognized_id = str(self._owner_ids[row])
+                results.append((recognized_id, max_similarity, self._database[recognized_id]))
                 
-            # Calculate similarity with each embedding
-            similarities = []
-            for emb in person_embeddings:
-                emb_array = np.array(emb)
-                # Reshape for sklearn
-                similarity = cosine_similarity([face_embedding], [emb_array])[0][0]
-                similarities.append(similarity)
-            
-            # Get maximum similarity
-            person_similarity = max(similarities)
-            
-            # Update if this is the best match so far
-            if person_similarity > max_similarity:
-                max_similarity = person_similarity
-                recognized_id = person_id
-                person_record = person_data
-        
-        # Return unknown if similarity is below threshold
-        if max_similarity < self.recognition_threshold:
-            return "unknown", max_similarity, {}
-            
-        return recognized_id, max_similarity, person_record
+        return results
     
     def recognize_face_image(self, 
                            face_img: np.ndarray, 
-                           database: Dict[str, Dict[str, Any]]) -> Tuple[str, float, Dict[str, Any]]:
+                           database: Optional[Dict[str, Dict[str, Any]]] = None) -> Tuple[str, float, Dict[str, Any]]:
         """
         Recognize a face directly from an image.
         
         Args:
             face_img: Face image (BGR format)
-            database: Dictionary of person records with embeddings
+            database: Dictionary of person records with embeddings (optional,
+                      see recognize_face)
             
         Returns:
             Tuple containing:
@@ -135,4 +576,25 @@ class FaceRecognizer:
         embedding = self.generate_embedding(face_img)
         
         # Recognize face
-        return self.recognize_face(embedding, database) 
\ No newline at end of file
+        return self.recognize_face(embedding, database)
+        
+    def recognize_faces_batch(self, 
+                              face_imgs: List[np.ndarray], 
+                              database: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Recognize several face images with a single model forward pass.
+        
+        Args:
+            face_imgs: List of face images (BGR format)
+            database: Dictionary of person records with embeddings (optional,
+                      see recognize_face)
+            
+        Returns:
+            List of (person ID, similarity, person record) tuples, one per face
+        """
+        embeddings = self.generate_embeddings_batch(face_imgs)
+        
+        if len(embeddings) == 0:
+            return [("unknown", 0.0, {}) for _ in face_imgs]
+            
+        return self.recognize_embeddings(embeddings, database)
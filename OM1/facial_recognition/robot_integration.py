@@ -9,15 +9,132 @@ import os
 import cv2
 import time
 import threading
+import queue
+from collections import deque
 import numpy as np
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, List, Tuple, Any, Optional, Callable
 from pathlib import Path
 import json
 
 from .face_detector import FaceDetector
 from .face_recognizer import FaceRecognizer
 from .database import PersonDatabase
-from .utils import preprocess_image_for_recognition
+from .utils import FaceTracker, open_camera, downscale_frame, scale_detections
+
+# Frames are downscaled to this width once before detection; the detector
+# resizes to its 640 px input anyway and face crops stay large enough for
+# the recognizer
+DETECTION_WIDTH = 640
+
+# Even in a static scene a frame is passed on to detection this often
+# (seconds), so a person who stopped moving is still recognized
+IDLE_FRAME_INTERVAL = 5.0
+
+class EmbeddingCache:
+    """
+    Cache of face embeddings looked up by the appearance of the face crop.
+    
+    Crops are reduced to a 16x16 grayscale thumbnail. A lookup returns the
+    embedding of the closest cached thumbnail when their mean absolute
+    difference is small, so the same face in a static scene skips the
+    embedding model despite sensor noise and small shifts of its box.
+    When full, the least recently used entry is replaced.
+    """
+    
+    def __init__(self, capacity: int = 1000, ttl: float = 60.0, max_difference: float = 6.0):
+        """
+        Initialize the cache.
+        
+        Args:
+            capacity: Maximum number of cached embeddings
+            ttl: Time in seconds after which an entry expires
+            max_difference: Largest mean absolute difference (0-255) between
+                            two thumbnails still treated as the same face
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_difference = max_difference
+        
+        # One slot per entry; thumbnails are stacked so a lookup compares
+        # against all of them at once
+        self._thumbnails = np.zeros((capacity, 256), dtype=np.float32)
+        self._embeddings = [None] * capacity
+        self._created = np.full(capacity, -np.inf)
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._uses = 0
+        
+    @staticmethod
+    def thumbnail(face_img: np.ndarray) -> np.ndarray:
+        """
+        Compute the thumbnail a face crop is cached under.
+        
+        Args:
+            face_img: Face image (BGR format)
+            
+        Returns:
+            Flattened 16x16 grayscale thumbnail of the face, float32
+        """
+        thumbnail = cv2.resize(face_img, (16, 16), interpolation=cv2.INTER_AREA)
+        if thumbnail.ndim == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        return thumbnail.astype(np.float32).ravel()
+        
+    def _valid(self) -> np.ndarray:
+        """Mask of the slots holding an unexpired entry."""
+        return time.time() - self._created <= self.ttl
+        
+    def get(self, thumbnail: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Look up the embedding of a face similar to the given one.
+        
+        Args:
+            thumbnail: Thumbnail from EmbeddingCache.thumbnail
+            
+        Returns:
+            Cached embedding, or None if no unexpired entry is close enough
+        """
+        valid = self._valid()
+        if not valid.any():
+            return None
+            
+        differences = np.abs(self._thumbnails - thumbnail).mean(axis=1)
+        differences[~valid] = np.inf
+        slot = int(differences.argmin())
+        if differences[slot] > self.max_difference:
+            return None
+            
+        self._uses += 1
+        self._last_used[slot] = self._uses
+        return self._embeddings[slot]
+        
+    def put(self, thumbnail: np.ndarray, embedding: np.ndarray):
+        """
+        Store an embedding, replacing an expired or the least recently used
+        entry when full.
+        
+        Args:
+            thumbnail: Thumbnail from EmbeddingCache.thumbnail
+            embedding: Embedding of the face
+        """
+        if self.capacity <= 0:
+            return
+            
+        # Expired and empty slots are reused first
+        slot = int(np.where(self._valid(), self._last_used, -1).argmin())
+        
+        self._uses += 1
+        self._thumbnails[slot] = thumbnail
+        self._embeddings[slot] = embedding
+        self._created[slot] = time.time()
+        self._last_used[slot] = self._uses
+            
+    def clear(self):
+        """Remove all cached embeddings."""
+        self._embeddings = [None] * self.capacity
+        self._created[:] = -np.inf
+        
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._valid()))
 
 class FacialRecognitionService:
     """
@@ -31,7 +148,11 @@ class FacialRecognitionService:
                 detector_confidence: float = 0.7,
                 recognition_threshold: float = 0.6,
                 recognition_interval: float = 2.0,
-                speaker_callback: Optional[Callable[[str], None]] = None):
+                speaker_callback: Optional[Callable[[str], None]] = None,
+                batch_size: int = 4,
+                cache_capacity: int = 1000,
+                cache_ttl: float = 60.0,
+                motion_threshold: float = 3.0):
         """
         Initialize the facial recognition service.
         
@@ -42,26 +163,51 @@ class FacialRecognitionService:
             recognition_threshold: Threshold for face recognition
             recognition_interval: Minimum time between recognition attempts (seconds)
             speaker_callback: Callback function for speaking recognition results
+            batch_size: Number of frames sampled per recognition interval and
+                        passed to the detector in one batch
+            cache_capacity: Maximum number of face embeddings kept in the cache
+            cache_ttl: Time in seconds a cached face embedding stays valid
+            motion_threshold: Mean absolute difference (0-255) of a downsampled
+                              grayscale frame from the last processed one below
+                              which the frame is skipped as unchanged (0 disables)
         """
         # Initialize components
         self.database = PersonDatabase(database_path, image_folder)
-        self.detector = FaceDetector(confidence=detector_confidence)
-        self.recognizer = FaceRecognizer(recognition_threshold=recognition_threshold)
+        # Split the CPU cores between the detector and the recognizer, and
+        # keep the recognizer on the CPU when the detector has the GPU
+        num_threads = max(1, (os.cpu_count() or 2) // 2)
+        self.detector = FaceDetector(confidence=detector_confidence, num_threads=num_threads)
+        self.recognizer = FaceRecognizer(recognition_threshold=recognition_threshold,
+                                         device="cpu" if self.detector.device != "cpu" else "auto",
+                                         num_threads=num_threads)
         
         # Configuration
         self.recognition_interval = recognition_interval
+        self.batch_size = max(1, batch_size)
+        self.motion_threshold = motion_threshold
         self.speaker_callback = speaker_callback
         
         # State variables
         self.running = False
         self.last_recognition_time = 0
         self.last_recognition_results = {}
-        self.recognition_thread = None
+        # Tracks must outlive the gap between detections of a still scene,
+        # which only passes a frame every IDLE_FRAME_INTERVAL, or a person
+        # standing still would be announced again on every detection
+        self.tracker = FaceTracker(max_age=2 * max(IDLE_FRAME_INTERVAL, recognition_interval))
+        self.embedding_cache = EmbeddingCache(cache_capacity, cache_ttl)
+        self.threads = []
         self.camera = None
         self.camera_id = 0
         
+        # Capture, detection and recognition run in their own threads and
+        # hand over only the latest item, so a slow stage never queues up
+        # stale frames behind it
+        self._frame_queue = queue.Queue(maxsize=1)
+        self._face_queue = queue.Queue(maxsize=1)
+        
         # Load recognition database
-        self.recognition_db = self.database.get_database_for_recognition()
+        self._update_recognizer()
         
     def set_speaker_callback(self, callback: Callable[[str], None]):
         """
@@ -74,8 +220,17 @@ class FacialRecognitionService:
         
     def reload_database(self):
         """Reload the recognition database from storage."""
+        self.database.reload()
+        self._update_recognizer()
+        
+    def _update_recognizer(self):
+        """Point the recognizer at the embeddings currently in the database."""
         self.recognition_db = self.database.get_database_for_recognition()
         
+        # Reuse the database's stacked embeddings instead of restacking them
+        matrix, owner_ids = self.database.get_embedding_matrix()
+        self.recognizer.set_embeddings(matrix, owner_ids, self.recognition_db)
+        
     def start(self, camera_id: int = 0):
         """
         Start the facial recognition service.
@@ -90,11 +245,25 @@ class FacialRecognitionService:
         # Set camera ID
         self.camera_id = camera_id
         
-        # Start recognition thread
+        # Fresh queues, so no stop sentinel from a previous run is left over
+        self._frame_queue = queue.Queue(maxsize=1)
+        self._face_queue = queue.Queue(maxsize=1)
+        
+        # Warm up both models for the shapes the loops use (open_camera's
+        # 640x480 frames, in detection batches), so the first recognition
+        # is not delayed by model setup
+        self.detector.warmup((480, DETECTION_WIDTH, 3), self.batch_size)
+        self.recognizer.warmup()
+        
+        # Start capture, detection and recognition threads
         self.running = True
-        self.recognition_thread = threading.Thread(target=self._recognition_loop)
-        self.recognition_thread.daemon = True
-        self.recognition_thread.start()
+        self.threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._detection_loop, daemon=True),
+            threading.Thread(target=self._recognition_loop, daemon=True)
+        ]
+        for thread in self.threads:
+            thread.start()
         
         print(f"Facial recognition service started with camera {camera_id}")
         
@@ -104,30 +273,56 @@ class FacialRecognitionService:
             print("Facial recognition service is not running")
             return
             
-        # Stop thread
+        # Stop threads, waking any that wait on a queue. The capture thread
+        # owns the camera and releases it on its way out, so wait for it
+        # rather than release the camera while it may still be reading
         self.running = False
-        if self.recognition_thread:
-            self.recognition_thread.join(timeout=1.0)
-            
-        # Release camera
-        if self.camera:
-            self.camera.release()
-            self.camera = None
+        self._put_latest(self._frame_queue, None)
+        self._put_latest(self._face_queue, None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
             
         print("Facial recognition service stopped")
         
-    def _recognition_loop(self):
-        """Main recognition loop running in a separate thread."""
+    @staticmethod
+    def _put_latest(item_queue: queue.Queue, item: Any):
+        """
+        Put an item on a bounded queue, dropping the oldest item if it is full.
+        
+        Args:
+            item_queue: Queue to put the item on
+            item: Item to put
+        """
+        while True:
+            try:
+                item_queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    item_queue.get_nowait()
+                except queue.Empty:
+                    pass
+        
+    def _capture_loop(self):
+        """Capture frames from the camera and pass on the latest one."""
         # Open camera
-        self.camera = cv2.VideoCapture(self.camera_id)
+        self.camera = open_camera(self.camera_id)
         
         if not self.camera.isOpened():
             print(f"Error: Could not open camera {self.camera_id}")
+            self.camera.release()
+            self.camera = None
             self.running = False
+            self._put_latest(self._frame_queue, None)
             return
             
         print("Facial recognition loop started")
         
+        # Thumbnail of the last frame passed on, to detect scene changes
+        reference = None
+        last_passed_time = 0
+        
         while self.running:
             # Capture frame
             ret, frame = self.camera.read()
@@ -137,26 +332,92 @@ class FacialRecognitionService:
                 time.sleep(0.1)
                 continue
                 
-            # Check if it's time for another recognition attempt
+            # Downscale once for detection; the motion check below works on
+            # the downscaled frame instead of another pass over the full one
+            small_frame, scale = downscale_frame(frame, DETECTION_WIDTH)
+            
+            # Skip detection entirely while nothing in the scene moves
             current_time = time.time()
-            if current_time - self.last_recognition_time >= self.recognition_interval:
-                # Detect faces
-                faces, metadata = self.detector.detect_faces(frame)
+            thumbnail = cv2.cvtColor(cv2.resize(small_frame, (80, 60), interpolation=cv2.INTER_AREA),
+                                     cv2.COLOR_BGR2GRAY)
+            if (reference is not None and
+                    current_time - last_passed_time < IDLE_FRAME_INTERVAL and
+                    cv2.absdiff(thumbnail, reference).mean() < self.motion_threshold):
+                continue
                 
-                if faces:
-                    # Perform recognition on detected faces
-                    self._process_faces(faces, metadata, frame)
-                    
-                    # Update last recognition time
-                    self.last_recognition_time = current_time
-            
-            # Short sleep to prevent maxing out CPU
-            time.sleep(0.01)
+            reference = thumbnail
+            last_passed_time = current_time
+            self._put_latest(self._frame_queue, (frame, small_frame, scale))
             
         # Clean up
         if self.camera:
             self.camera.release()
             self.camera = None
+            
+    def _detection_loop(self):
+        """Detect faces in batches of sampled frames."""
+        # Frames sampled evenly across the recognition interval with their
+        # capture times, detected together in one batch
+        samples = deque(maxlen=self.batch_size)
+        sample_interval = self.recognition_interval / self.batch_size
+        last_sample_time = 0
+        last_detection_time = 0
+        
+        while self.running:
+            try:
+                sample = self._frame_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+                
+            if sample is None:
+                break
+                
+            # Sample frames for the next detection batch
+            current_time = time.time()
+            if current_time - last_sample_time >= sample_interval:
+                samples.append((current_time, sample))
+                last_sample_time = current_time
+                
+            # Drop samples older than one interval, e.g. left over from
+            # before the scene went still
+            while samples and current_time - samples[0][0] > self.recognition_interval:
+                samples.popleft()
+                
+            # Check if it's time for another recognition attempt. A still
+            # scene passes too few frames to fill a batch, so detect on
+            # whatever was sampled once the interval is over
+            if samples and current_time - last_detection_time >= self.recognition_interval:
+                # Detect faces in all sampled frames with one model call
+                detections = self.detector.detect_faces_batch([small_frame for _, (_, small_frame, _) in samples])
+                
+                # Recognize faces in the most recent frame that has any; crops
+                # come from the downscaled frame, boxes are mapped back to
+                # full resolution
+                for (_, (sampled_frame, _, scale)), (faces, metadata) in zip(reversed(samples), reversed(detections)):
+                    if faces:
+                        scale_detections(metadata, scale)
+                        self._put_latest(self._face_queue, (faces, metadata, sampled_frame))
+                        
+                        # Update last recognition time
+                        self.last_recognition_time = current_time
+                        break
+                        
+                samples.clear()
+                last_detection_time = current_time
+                
+    def _recognition_loop(self):
+        """Recognize detected faces and announce known persons."""
+        while self.running:
+            try:
+                item = self._face_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+                
+            if item is None:
+                break
+                
+            faces, metadata, frame = item
+            self._process_faces(faces, metadata, frame)
     
     def _process_faces(self, faces: List[np.ndarray], metadata: List[Dict[str, Any]], frame: np.ndarray):
         """
@@ -171,15 +432,18 @@ class FacialRecognitionService:
         current_results = {}
         recognized_persons = []
         
+        # Faces still where a recognized face was keep its identity; only
+        # the others are recognized, with one search of the embedding index
+        tracks = self.tracker.match([face_meta["bbox"] for face_meta in metadata])
+        new_faces = [i for i, track in enumerate(tracks) if track is None]
+        new_results = self._recognize_new_faces([faces[i] for i in new_faces]) if new_faces else []
+        results = {i: (track["person_id"], track["similarity"], track["person_data"])
+                   for i, track in enumerate(tracks) if track is not None}
+        results.update(zip(new_faces, new_results))
+        
         # Process each face
-        for i, (face_img, face_meta) in enumerate(zip(faces, metadata)):
-            # Preprocess face
-            face_img = preprocess_image_for_recognition(face_img)
-            
-            # Recognize face
-            person_id, similarity, person_data = self.recognizer.recognize_face_image(
-                face_img, self.recognition_db
-            )
+        for i, face_meta in enumerate(metadata):
+            person_id, similarity, person_data = results[i]
             
             # Store result
             bbox = face_meta["bbox"]
@@ -190,8 +454,10 @@ class FacialRecognitionService:
                 "person_data": person_data
             }
             
-            # Add to recognized persons if known
-            if person_id != "unknown":
+            # Track and announce newly recognized known persons; tracked
+            # ones were already announced
+            if person_id != "unknown" and tracks[i] is None:
+                self.tracker.add(bbox, person_id, similarity, person_data)
                 recognized_persons.append(person_data)
         
         # Update last recognition results
@@ -200,6 +466,32 @@ class FacialRecognitionService:
         # Generate speech for recognized persons
         self._announce_recognized_persons(recognized_persons)
     
+    def _recognize_new_faces(self, faces: List[np.ndarray]) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Recognize faces, reusing cached embeddings of similar-looking crops.
+        
+        Args:
+            faces: List of face images
+            
+        Returns:
+            List of (person ID, similarity, person record) tuples, one per face
+        """
+        thumbnails = [EmbeddingCache.thumbnail(face) for face in faces]
+        embeddings = [self.embedding_cache.get(thumbnail) for thumbnail in thumbnails]
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        
+        # Only crops not seen recently go through the embedding model
+        if misses:
+            new_embeddings = self.recognizer.generate_embeddings_batch([faces[i] for i in misses])
+            if len(new_embeddings) == 0:
+                return [("unknown", 0.0, {}) for _ in faces]
+                
+            for i, embedding in zip(misses, new_embeddings):
+                self.embedding_cache.put(thumbnails[i], embedding)
+                embeddings[i] = embedding
+                
+        return self.recognizer.recognize_embeddings(np.stack(embeddings), self.recognition_db)
+        
     def _announce_recognized_persons(self, persons: List[Dict[str, Any]]):
         """
         Generate and speak announcements for recognized persons.
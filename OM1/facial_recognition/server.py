@@ -1,14 +1,29 @@
-from fastapi import FastAPI, HTTPException
+import os
+
+# Let TensorFlow use its oneDNN (AVX2/AVX-512) kernels for the embedding
+# model. Must be set before deepface imports tensorflow.
+os.environ.setdefault('TF_ENABLE_ONEDNN_OPTS', '1')
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import json
+import cv2
 import base64
-from io import BytesIO
-from PIL import Image
+import binascii
+
+# Keep OpenCV's SIMD/IPP paths on, and leave half the cores to the model so
+# the two thread pools do not oversubscribe the CPU. For AVX2/FMA image ops,
+# replace opencv-python with a build configured with WITH_IPP=ON and
+# CPU_BASELINE=AVX2 (e.g. a source build of opencv-contrib-python-headless).
+cv2.setUseOptimized(True)
+cv2.setNumThreads(max(1, (os.cpu_count() or 2) // 2))
 
 from face_detector import FaceDetector
 from face_recognizer import FaceRecognizer
+from embedding_store import load_embedding_store
 
 app = FastAPI()
 
@@ -25,66 +40,169 @@ app.add_middleware(
 detector = FaceDetector(confidence=0.5)
 recognizer = FaceRecognizer(recognition_threshold=0.6)
 
-# Load face database
+# The models are not thread-safe, so inference runs on a single worker
+# thread; image decoding uses the default pool and runs concurrently
+inference_executor = ThreadPoolExecutor(max_workers=1)
+
+DATABASE_PATH = 'data/face_database.json'
+
+# Load face database with its memory-mapped embedding matrix (databases in
+# the older all-JSON format are stacked into a matrix once at load)
 try:
-    with open('data/face_database.json', 'r') as f:
-        face_database = json.load(f)
-    print(f"Loaded face database with {len(face_database)} entries")
+    matrix, owner_ids, face_database = load_embedding_store(DATABASE_PATH)
+    recognizer.set_embeddings(matrix, owner_ids, face_database)
+    print(f"Loaded face database with {len(face_database)} entries ({len(matrix)} embeddings)")
 except Exception as e:
     print(f"Error loading face database: {e}")
     face_database = {}
+    recognizer.set_database(face_database)
 
 class ImageRequest(BaseModel):
     image: str  # Base64 encoded image
 
-def process_base64_image(base64_string: str):
+def process_base64_image(base64_string: str) -> np.ndarray:
     # Remove data URL prefix if present
     if 'base64,' in base64_string:
         base64_string = base64_string.split('base64,')[1]
     
     # Decode base64 string to bytes
-    image_bytes = base64.b64decode(base64_string)
+    try:
+        image_bytes = base64.b64decode(base64_string)
+    except binascii.Error:
+        raise HTTPException(status_code=400, detail="Invalid base64 image data")
+    
+    return decode_image_bytes(image_bytes)
+
+def decode_image_bytes(image_bytes: bytes) -> np.ndarray:
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Empty image data")
     
-    # Convert to PIL Image
-    image = Image.open(BytesIO(image_bytes))
+    # Decode straight into a BGR array, the format the detector expects
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise HTTPException(status_code=400, detail="Could not decode image")
     
-    # Convert to RGB if needed
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
+    return image
+
+class AsyncBatchQueue:
+    """Collects faces from concurrent requests and recognizes them in batches"""
     
-    # Convert to numpy array
-    return np.array(image)
+    def __init__(self, max_batch_size: int = 32, max_wait_time: float = 0.02):
+        """
+        Args:
+            max_batch_size: Maximum number of faces per forward pass
+            max_wait_time: Seconds to wait for more faces after the first one
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+        self._queue = None
+        self._task = None
+        self._loop = None
+    
+    def start(self):
+        """Start the batching loop on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+    
+    async def add_request(self, face_img: np.ndarray) -> asyncio.Future:
+        """Queue a face and return a future for its (person_id, similarity, person_data)"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((face_img, future))
+        return future
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            # Block for the first face, then gather more until the batch is
+            # full or the wait time runs out
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_time
+            
+            while len(items) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            faces = [face_img for face_img, _ in items]
+            
+            try:
+                results = await loop.run_in_executor(inference_executor, recognizer.recognize_faces_batch, faces)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+
+# Faces from concurrent requests share one embedding forward pass
+batch_queue = AsyncBatchQueue(max_batch_size=32, max_wait_time=0.02)
+
+@app.on_event("startup")
+async def start_batch_queue():
+    batch_queue.start()
+
+async def recognize_persons(image: np.ndarray):
+    """Run detection and recognition on a decoded image and format the response"""
+    # Detect faces without blocking other requests
+    loop = asyncio.get_running_loop()
+    faces, metadata = await loop.run_in_executor(inference_executor, detector.detect_faces, image)
+    
+    # Recognize the faces together with those of other pending requests
+    futures = [await batch_queue.add_request(face_img) for face_img in faces]
+    results = await asyncio.gather(*futures)
+    
+    # List to store detected persons
+    detected_persons = []
+    
+    for person_id, similarity, person_data in results:
+        # Always add the person to the list, even if unknown
+        person_info = {
+            "name": person_data.get("name", person_id) if person_id != "unknown" else "unknown",
+            "similarity": float(similarity) if person_id != "unknown" else 0.0,
+            "relation": person_data.get("relation", "Unknown") if person_id != "unknown" else "Unknown"
+        }
+        detected_persons.append(person_info)
+    
+    return {"persons": detected_persons}
 
 @app.post("/detect")
 async def detect_faces(request: ImageRequest):
     try:
-        # Convert base64 to numpy array
-        image = process_base64_image(request.image)
-        
-        # Detect faces
-        faces, metadata = detector.detect_faces(image)
+        # Convert base64 to numpy array off the event loop
+        image = await asyncio.to_thread(process_base64_image, request.image)
         
-        # List to store detected persons
-        detected_persons = []
-        
-        # Process each detected face
-        for face_img in faces:
-            # Recognize face
-            person_id, similarity, person_data = recognizer.recognize_face_image(
-                face_img, 
-                face_database
-            )
-            
-            # Always add the person to the list, even if unknown
-            person_info = {
-                "name": person_data.get("name", person_id) if person_id != "unknown" else "unknown",
-                "similarity": float(similarity) if person_id != "unknown" else 0.0,
-                "relation": person_data.get("relation", "Unknown") if person_id != "unknown" else "Unknown"
-            }
-            detected_persons.append(person_info)
+        return await recognize_persons(image)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error processing request: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/detect_raw")
+async def detect_faces_raw(file: UploadFile = File(...)):
+    """Same as /detect, but takes the encoded image as a multipart upload"""
+    try:
+        # Binary upload avoids the base64 inflation and decode step
+        image_bytes = await file.read()
+        image = await asyncio.to_thread(decode_image_bytes, image_bytes)
         
-        return {"persons": detected_persons}
+        return await recognize_persons(image)
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error processing request: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -5,15 +5,89 @@ This script demonstrates the facial detection capabilities
 without the full recognition system.
 """
 
+import os
 import cv2
 import argparse
+import glob
 import time
+import numpy as np
 from pathlib import Path
 
 # Fix the import to use a relative import within the same package
 from face_detector import FaceDetector
+from utils import FrameGrabber, TextOverlay, open_camera, downscale_frame, scale_detections
 
-def test_webcam_detection(camera_id=0, confidence=0.5, display_fps=True):
+# Frames between polls of the GUI event loop (and the quit key) in webcam mode
+UI_POLL_INTERVAL = 2
+
+# Seconds between refreshes of the FPS text, so the overlay's text cache is
+# not defeated by a new string every frame
+FPS_TEXT_INTERVAL = 0.5
+
+def create_detector(confidence=0.5, detect_width=None, backend="auto", device="auto"):
+    """
+    Create a face detector for a given working resolution.
+    
+    Args:
+        confidence: Detection confidence threshold
+        detect_width: Width frames are downscaled to before detection, or
+                      None to detect at the default 640 px input size
+        backend: Inference backend ('auto', 'pytorch', 'tensorrt' or 'openvino')
+        device: Device to run inference on ('auto', 'cpu' or 'cuda')
+    
+    Returns:
+        Face detector whose input size matches detect_width
+    """
+    if detect_width is None:
+        return FaceDetector(confidence=confidence, device=device, backend=backend)
+        
+    # The network input must be a multiple of its 32 px stride; a smaller
+    # input is what actually reduces the detector's cost
+    return FaceDetector(confidence=confidence, device=device, backend=backend, 
+                        image_size=-(-detect_width // 32) * 32)
+
+def detect_downscaled(detector, image, detect_width=None):
+    """
+    Detect faces on a downscaled copy of an image.
+    
+    Args:
+        detector: Face detector
+        image: Input image (BGR format)
+        detect_width: Width to downscale to before detection (None for none)
+    
+    Returns:
+        Face crops from the downscaled image and metadata with bounding
+        boxes in full-resolution coordinates
+    """
+    if detect_width is None:
+        return detector.detect_faces(image)
+        
+    small, scale = downscale_frame(image, detect_width)
+    faces, metadata = detector.detect_faces(small)
+    return faces, scale_detections(metadata, scale)
+
+def face_mosaic(faces, tile_size=128):
+    """
+    Composite face crops side by side into one image, so they can be shown
+    in a single window.
+    
+    Args:
+        faces: Face images (BGR format)
+        tile_size: Height and width of each face tile
+    
+    Returns:
+        Image of shape (tile_size, tile_size * max(1, len(faces)), 3)
+    """
+    mosaic = np.zeros((tile_size, tile_size * max(1, len(faces)), 3), dtype=np.uint8)
+    for i, face_img in enumerate(faces):
+        # Resize straight into the face's slot of the mosaic
+        cv2.resize(face_img, (tile_size, tile_size), 
+                   dst=mosaic[:, i * tile_size:(i + 1) * tile_size])
+    return mosaic
+
+def test_webcam_detection(camera_id=0, confidence=0.5, display_fps=True, detect_width=None,
+                          detect_every=1, backend="auto", device="auto", 
+                          width=640, height=480, camera_fps=None):
     """
     Test facial detection using webcam feed.
     
@@ -21,90 +95,129 @@ def test_webcam_detection(camera_id=0, confidence=0.5, display_fps=True):
         camera_id: Camera device ID
         confidence: Detection confidence threshold
         display_fps: Whether to display frames per second
+        detect_width: Width frames are downscaled to before detection
+        detect_every: Run detection on every Nth frame only; the frames in
+                      between show the last detections
+        backend: Inference backend ('auto', 'pytorch', 'tensorrt' or 'openvino')
+        device: Device to run inference on ('auto', 'cpu' or 'cuda')
+        width: Requested camera frame width
+        height: Requested camera frame height
+        camera_fps: Requested camera frame rate (None for the camera default)
     """
     # Initialize detector
     print("Initializing face detector...")
-    detector = FaceDetector(confidence=confidence)
+    detector = create_detector(confidence, detect_width, backend, device)
     
     # Open webcam
     print(f"Opening camera {camera_id}...")
-    cap = cv2.VideoCapture(camera_id)
+    cap = open_camera(camera_id, width, height, camera_fps)
     
     if not cap.isOpened():
         print(f"Error: Could not open camera {camera_id}")
         return
     
+    # Capture in the background, so detection always gets the newest frame
+    grabber = FrameGrabber(cap).start()
+    
+    # Warm up on a real frame, so model setup for the camera's frame size and
+    # JIT compilation are not counted in the measured detection times
+    ret, frame = grabber.get_latest()
+    if ret:
+        for _ in range(2):
+            detect_downscaled(detector, frame, detect_width)
+    
     print("Face detection test started. Press 'q' to quit.")
     
-    # Variables for FPS calculation
-    frame_count = 0
-    start_time = time.time()
-    fps = 0
+    # FPS as an exponential moving average of the frame rate
+    previous_time = time.perf_counter_ns()
+    fps = 0.0
+    fps_text, fps_text_time = "FPS: 0.0", previous_time
+    
+    # Status text is rendered once per distinct string and then blitted
+    overlay = TextOverlay()
+    
+    # Last detections, redrawn on frames that skip detection
+    frame_index = 0
+    faces, metadata = [], []
+    detection_time = 0.0
+    
+    # Frame the detections are drawn on, reused across iterations
+    display_frame = None
     
     while True:
-        ret, frame = cap.read()
+        ret, frame = grabber.get_latest()
         
         if not ret:
             print("Error: Failed to capture image")
             break
         
         # Detect faces
-        detection_start = time.time()
-        faces, metadata = detector.detect_faces(frame)
-        detection_time = (time.time() - detection_start) * 1000  # Convert to ms
+        if frame_index % detect_every == 0:
+            detection_start = time.perf_counter_ns()
+            faces, metadata = detect_downscaled(detector, frame, detect_width)
+            detection_time = (time.perf_counter_ns() - detection_start) * 1e-6  # Convert to ms
+            mosaic = face_mosaic(faces)
+            mosaic_changed = True
+            
+            # Status lines change only with the detections
+            status_texts = (f"Detection: {detection_time:.1f} ms", f"Faces found: {len(faces)}")
+        frame_index += 1
         
-        # Draw detection on frame
-        display_frame = detector.detect_faces_and_draw(frame)
+        # Draw the detections on a copy, since the face crops are views of the frame
+        if display_frame is None or display_frame.shape != frame.shape:
+            display_frame = np.empty_like(frame)
+        np.copyto(display_frame, frame)
+        detector.draw(display_frame, metadata)
         
         # Update FPS
-        frame_count += 1
-        elapsed_time = time.time() - start_time
-        if elapsed_time >= 1.0:  # Update FPS every second
-            fps = frame_count / elapsed_time
-            frame_count = 0
-            start_time = time.time()
+        current_time = time.perf_counter_ns()
+        frame_interval = (current_time - previous_time) * 1e-9
+        previous_time = current_time
+        if frame_interval > 0:
+            fps = 0.9 * fps + 0.1 / frame_interval
+        if (current_time - fps_text_time) * 1e-9 >= FPS_TEXT_INTERVAL:
+            fps_text, fps_text_time = f"FPS: {fps:.1f}", current_time
         
         # Display info
         if display_fps:
-            cv2.putText(display_frame, f"FPS: {fps:.1f}", 
-                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            cv2.putText(display_frame, f"Detection: {detection_time:.1f} ms", 
-                       (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            cv2.putText(display_frame, f"Faces found: {len(faces)}", 
-                       (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            
-        # Display faces found
-        for i, (face_img, face_meta) in enumerate(zip(faces, metadata)):
-            # Create a separate window for each detected face
-            face_window_name = f"Face {i+1}"
-            cv2.imshow(face_window_name, face_img)
+            overlay.draw(display_frame, fps_text, (10, 30))
+            overlay.draw(display_frame, status_texts[0], (10, 60))
+            overlay.draw(display_frame, status_texts[1], (10, 90))
             
-            # Position the windows in a logical way
-            cv2.moveWindow(face_window_name, 800, i * 200)
+        # Display faces found, all in one window, only when they changed
+        if mosaic_changed:
+            cv2.imshow("Faces", mosaic)
+            mosaic_changed = False
         
         # Display the main frame
         cv2.imshow("Face Detection Test", display_frame)
         
-        # Check for quit
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        # Pump GUI events and check for quit every few frames only, since
+        # each waitKey blocks for at least a millisecond
+        if frame_index % UI_POLL_INTERVAL == 0 and cv2.waitKey(1) & 0xFF == ord('q'):
             break
     
     # Release resources
+    grabber.stop()
     cap.release()
     cv2.destroyAllWindows()
     print("Test completed.")
 
-def test_image_detection(image_path, confidence=0.5):
+def test_image_detection(image_path, confidence=0.5, detect_width=None, 
+                         backend="auto", device="auto"):
     """
     Test facial detection on a single image.
     
     Args:
         image_path: Path to image file
         confidence: Detection confidence threshold
+        detect_width: Width the image is downscaled to before detection
+        backend: Inference backend ('auto', 'pytorch', 'tensorrt' or 'openvino')
+        device: Device to run inference on ('auto', 'cpu' or 'cuda')
     """
     # Initialize detector
     print("Initializing face detector...")
-    detector = FaceDetector(confidence=confidence)
+    detector = create_detector(confidence, detect_width, backend, device)
     
     # Load image
     print(f"Loading image: {image_path}")
@@ -115,26 +228,21 @@ def test_image_detection(image_path, confidence=0.5):
         return
     
     # Detect faces
-    detection_start = time.time()
-    faces, metadata = detector.detect_faces(image)
-    detection_time = (time.time() - detection_start) * 1000  # Convert to ms
+    detection_start = time.perf_counter_ns()
+    faces, metadata = detect_downscaled(detector, image, detect_width)
+    detection_time = (time.perf_counter_ns() - detection_start) * 1e-6  # Convert to ms
     
-    # Draw detection on image
-    display_image = detector.detect_faces_and_draw(image)
+    # Draw the detections on a copy, since the face crops are views of the image
+    display_image = detector.draw(image.copy(), metadata)
     
     # Display info
     print(f"Detection time: {detection_time:.1f} ms")
     print(f"Faces found: {len(faces)}")
     
-    # Display faces found
-    for i, (face_img, face_meta) in enumerate(zip(faces, metadata)):
-        # Create a separate window for each detected face
-        face_window_name = f"Face {i+1}"
-        cv2.imshow(face_window_name, face_img)
-        
-        # Position the windows in a logical way
-        cv2.moveWindow(face_window_name, 800, i * 200)
-        
+    # Display faces found, all in one window
+    cv2.imshow("Faces", face_mosaic(faces))
+    
+    for i, face_meta in enumerate(metadata):
         # Print face metadata
         print(f"Face {i+1}:")
         print(f"  Confidence: {face_meta['confidence']:.4f}")
@@ -147,6 +255,102 @@ def test_image_detection(image_path, confidence=0.5):
     cv2.destroyAllWindows()
     print("Test completed.")
 
+def find_images(pattern):
+    """
+    Find image files in a directory or matching a glob pattern.
+    
+    Args:
+        pattern: Directory path or glob pattern (e.g. "photos/*.jpg")
+    
+    Returns:
+        Sorted list of image paths
+    """
+    if Path(pattern).is_dir():
+        return sorted(str(path) for path in Path(pattern).iterdir()
+                      if path.suffix.lower() in (".jpg", ".jpeg", ".png", ".bmp"))
+    return sorted(glob.glob(pattern))
+
+def test_batch_detection(image_paths, confidence=0.5, detect_width=None, batch_size=8, 
+                         backend="auto", device="auto"):
+    """
+    Test facial detection on many images, detected in batches.
+    
+    Args:
+        image_paths: Paths to image files
+        confidence: Detection confidence threshold
+        detect_width: Width images are downscaled to before detection
+        batch_size: Number of images per detector call
+        backend: Inference backend ('auto', 'pytorch', 'tensorrt' or 'openvino')
+        device: Device to run inference on ('auto', 'cpu' or 'cuda')
+    """
+    # Initialize detector
+    print("Initializing face detector...")
+    detector = create_detector(confidence, detect_width, backend, device)
+    
+    total_time = 0.0
+    total_images = 0
+    total_faces = 0
+    
+    for batch_start in range(0, len(image_paths), batch_size):
+        # Load the next batch of images
+        paths = []
+        images = []
+        for image_path in image_paths[batch_start:batch_start + batch_size]:
+            image = cv2.imread(image_path)
+            if image is None:
+                print(f"Error: Could not load image {image_path}")
+                continue
+            paths.append(image_path)
+            images.append(image)
+            
+        if not images:
+            continue
+            
+        # Detect faces in the whole batch with one model call
+        detection_start = time.perf_counter_ns()
+        if detect_width is None:
+            detections = detector.detect_faces_batch(images, return_cropped=False)
+        else:
+            downscaled = [downscale_frame(image, detect_width) for image in images]
+            detections = detector.detect_faces_batch([small for small, _ in downscaled], 
+                                                     return_cropped=False)
+            detections = [(faces, scale_detections(metadata, scale))
+                          for (faces, metadata), (_, scale) in zip(detections, downscaled)]
+        total_time += (time.perf_counter_ns() - detection_start) * 1e-6  # Convert to ms
+        
+        for image_path, (_, metadata) in zip(paths, detections):
+            print(f"{image_path}: {len(metadata)} face(s)")
+            for face_meta in metadata:
+                print(f"  Confidence: {face_meta['confidence']:.4f}, Bounding box: {face_meta['bbox']}")
+            total_faces += len(metadata)
+            
+        total_images += len(images)
+    
+    if total_images == 0:
+        print("No images could be loaded")
+        return
+        
+    print(f"Detected {total_faces} face(s) in {total_images} image(s)")
+    print(f"Detection time: {total_time:.1f} ms total, {total_time / total_images:.1f} ms per image")
+    print("Test completed.")
+
+def configure_opencv_threads(threads=None):
+    """
+    Set the size of OpenCV's parallel_for_ thread pool.
+    
+    Args:
+        threads: Number of threads, or None for all cores but one, which
+                 is left to the background capture thread
+    """
+    if threads is None:
+        threads = max(1, (os.cpu_count() or 2) - 1)
+    cv2.setNumThreads(threads)
+    
+    # Report which parallel framework backs the pool (TBB, OpenMP, pthreads)
+    framework = next((line.split(":", 1)[1].strip() for line in cv2.getBuildInformation().splitlines()
+                      if line.strip().startswith("Parallel framework:")), "unknown")
+    print(f"OpenCV threads: {cv2.getNumThreads()} ({framework})")
+
 def main():
     """Main function for test script."""
     parser = argparse.ArgumentParser(description="Test facial detection")
@@ -154,20 +358,52 @@ def main():
                       help="Test mode: use webcam or single image")
     parser.add_argument("--camera", type=int, default=0, 
                       help="Camera device ID (for webcam mode)")
-    parser.add_argument("--image", help="Path to image file (for image mode)")
+    parser.add_argument("--width", type=int, default=640,
+                      help="Camera frame width (for webcam mode)")
+    parser.add_argument("--height", type=int, default=480,
+                      help="Camera frame height (for webcam mode)")
+    parser.add_argument("--fps", type=int, default=None,
+                      help="Camera frame rate (for webcam mode; default: camera default)")
+    parser.add_argument("--image", 
+                      help="Path to image file, or a directory or glob pattern to detect "
+                           "many images in batches (for image mode)")
     parser.add_argument("--confidence", type=float, default=0.5, 
                       help="Detection confidence threshold")
     parser.add_argument("--no-fps", action="store_false", dest="display_fps", 
                       help="Hide FPS display")
+    parser.add_argument("--detect-width", type=int, default=None,
+                      help="Downscale frames to this width before detection (e.g. 320)")
+    parser.add_argument("--detect-every", type=int, default=1,
+                      help="Run detection on every Nth frame only (for webcam mode)")
+    parser.add_argument("--batch-size", type=int, default=8,
+                      help="Images per detector call when --image is a directory or glob")
+    parser.add_argument("--backend", choices=["auto", "pytorch", "tensorrt", "openvino"], default="auto",
+                      help="Inference backend (exported models are made by setup.py)")
+    parser.add_argument("--device", choices=["auto", "cpu", "cuda"], default="auto",
+                      help="Device to run detection on")
+    parser.add_argument("--threads", type=int, default=None,
+                      help="OpenCV worker threads (default: all cores but one)")
     
     args = parser.parse_args()
     
+    configure_opencv_threads(args.threads)
+    
     if args.mode == "webcam":
-        test_webcam_detection(args.camera, args.confidence, args.display_fps)
+        test_webcam_detection(args.camera, args.confidence, args.display_fps, args.detect_width,
+                              max(1, args.detect_every), args.backend, args.device,
+                              args.width, args.height, args.fps)
     else:  # image mode
         if not args.image:
             parser.error("--image is required for image mode")
-        test_image_detection(args.image, args.confidence)
+        if Path(args.image).is_file():
+            test_image_detection(args.image, args.confidence, args.detect_width, 
+                                 args.backend, args.device)
+        else:
+            image_paths = find_images(args.image)
+            if not image_paths:
+                parser.error(f"No images found for {args.image}")
+            test_batch_detection(image_paths, args.confidence, args.detect_width, max(1, args.batch_size),
+                                 args.backend, args.device)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
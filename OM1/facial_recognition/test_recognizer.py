@@ -10,16 +10,25 @@ Usage:
 """
 
 import os
+
+# Enable oneDNN kernels before deepface imports tensorflow
+os.environ.setdefault('TF_ENABLE_ONEDNN_OPTS', '1')
+
 import cv2
 import numpy as np
-import json
 import argparse
 import time
 from pathlib import Path
 from typing import Dict, Any, List, Tuple
 
+# Same OpenCV threading setup as server.py
+cv2.setUseOptimized(True)
+cv2.setNumThreads(max(1, (os.cpu_count() or 2) // 2))
+
 from face_detector import FaceDetector
 from face_recognizer import FaceRecognizer
+from utils import FaceTracker, open_camera, read_latest_frame
+from embedding_store import load_person_records
 
 def parse_args():
     """Parse command line arguments"""
@@ -38,17 +47,22 @@ def parse_args():
                         help="Face recognition similarity threshold")
     parser.add_argument("--display_scale", type=float, default=1.0,
                         help="Display scaling factor")
+    parser.add_argument("--track_iou", type=float, default=0.5,
+                        help="Minimum IoU to reuse the identity of a face from a previous frame")
+    parser.add_argument("--track_ttl", type=float, default=0.5,
+                        help="Seconds a tracked face is kept after it was last seen")
+    parser.add_argument("--onnx_model", type=str, default=None,
+                        help="ONNX export of the embedding model (see export_onnx.py)")
     return parser.parse_args()
 
 def load_database(database_path: str) -> Dict[str, Dict[str, Any]]:
-    """Load face recognition database from JSON file"""
+    """Load face recognition database with its embeddings"""
     if not os.path.exists(database_path):
         print(f"Error: Database file {database_path} not found")
         return {}
     
     try:
-        with open(database_path, 'r') as f:
-            database = json.load(f)
+        database = load_person_records(database_path)
         
         print(f"Loaded database with {len(database)} persons:")
         for person_id, person_data in database.items():
@@ -129,12 +143,14 @@ def run_recognition(args):
     print("Initializing face recognizer...")
     recognizer = FaceRecognizer(
         recognition_threshold=args.threshold,
-        enforce_detection=False
+        enforce_detection=False,
+        onnx_path=args.onnx_model
     )
+    recognizer.set_database(database)
     
     # Open webcam
     print(f"Opening camera {args.camera}...")
-    cap = cv2.VideoCapture(args.camera)
+    cap = open_camera(args.camera)
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, args.width)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, args.height)
     
@@ -147,11 +163,14 @@ def run_recognition(args):
     fps_start_time = time.time()
     fps = 0
     
+    # Faces seen in recent frames, used to skip re-embedding the same person
+    tracker = FaceTracker(iou_threshold=args.track_iou, max_age=args.track_ttl)
+    
     print("Starting real-time recognition. Press 'q' to quit.")
     
     while True:
         # Read frame
-        ret, frame = cap.read()
+        ret, frame = read_latest_frame(cap)
         if not ret:
             print("Error: Could not read frame from webcam")
             break
@@ -169,26 +188,37 @@ def run_recognition(args):
         faces, metadata = detector.detect_faces(frame)
         detection_time = time.time() - start_time
         
-        # Process each detected face
-        for i, (face, meta) in enumerate(zip(faces, metadata)):
-            # Get bounding box
-            x1, y1, x2, y2 = meta["bbox"]
-            
-            # Recognize face
+        # Match detections to known faces from previous frames; only faces
+        # without a confident match need a new embedding
+        tracks = tracker.match([meta["bbox"] for meta in metadata])
+        results = [(track["person_id"], track["similarity"], track["person_data"]) if track else None
+                   for track in tracks]
+        new_faces = [i for i, track in enumerate(tracks) if track is None]
+        
+        # Recognize the new faces in one batch
+        if new_faces:
             start_time = time.time()
-            person_id, similarity, person_data = recognizer.recognize_face_image(face, database)
+            new_results = recognizer.recognize_faces_batch([faces[i] for i in new_faces])
             recognition_time = time.time() - start_time
             
+            for i, (person_id, similarity, person_data) in zip(new_faces, new_results):
+                results[i] = (person_id, similarity, person_data)
+                
+                # Only known faces are tracked, unknown ones are retried next frame
+                if person_id != "unknown":
+                    tracker.add(metadata[i]["bbox"], person_id, similarity, person_data)
+        
+        # Draw results
+        for meta, (person_id, similarity, person_data) in zip(metadata, results):
             # Get person name
             if person_id == "unknown":
                 name = "Unknown"
             else:
                 name = person_data.get("name", person_id)
-            
-            # Draw results
+                
             frame = draw_detection(
                 frame, 
-                (x1, y1, x2, y2), 
+                meta["bbox"], 
                 person_id, 
                 name, 
                 similarity, 
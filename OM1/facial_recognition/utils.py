@@ -2,13 +2,110 @@
 Utility functions for image augmentation and processing.
 """
 
+import sys
+import time
+import threading
 import cv2
 import numpy as np
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import random
+from collections import OrderedDict
+from functools import lru_cache
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _adjust_brightness_kernel(image, factor, out):
+        """Scale each BGR pixel in one pass, as scaling V in HSV would."""
+        height, width = image.shape[:2]
+        for i in prange(height):
+            for j in range(width):
+                peak = max(image[i, j, 0], image[i, j, 1], image[i, j, 2])
+                scale = factor
+                if peak * factor > 255.0:
+                    scale = 255.0 / peak
+                for c in range(3):
+                    out[i, j, c] = np.uint8(image[i, j, c] * scale)
+
+    @njit(cache=True, fastmath=True)
+    def _iou_matrix_kernel(boxes_a, boxes_b):
+        """Pairwise IoU of two sets of (x1, y1, x2, y2) boxes."""
+        out = np.zeros((boxes_a.shape[0], boxes_b.shape[0]), dtype=np.float32)
+        for i in range(boxes_a.shape[0]):
+            area_a = (boxes_a[i, 2] - boxes_a[i, 0]) * (boxes_a[i, 3] - boxes_a[i, 1])
+            for j in range(boxes_b.shape[0]):
+                inter_w = min(boxes_a[i, 2], boxes_b[j, 2]) - max(boxes_a[i, 0], boxes_b[j, 0])
+                inter_h = min(boxes_a[i, 3], boxes_b[j, 3]) - max(boxes_a[i, 1], boxes_b[j, 1])
+                if inter_w <= 0 or inter_h <= 0:
+                    continue
+                intersection = inter_w * inter_h
+                area_b = (boxes_b[j, 2] - boxes_b[j, 0]) * (boxes_b[j, 3] - boxes_b[j, 1])
+                out[i, j] = intersection / (area_a + area_b - intersection)
+        return out
+
+# Shared CLAHE instance, so its lookup tables are not rebuilt for every face
+_CLAHE = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+
+class Augmenter:
+    """Face image augmenter that reuses its scratch buffer between calls."""
+    
+    def __init__(self, num_augmentations: int = 4):
+        """
+        Initialize the augmenter.
+        
+        Args:
+            num_augmentations: Number of augmented images to generate per face
+        """
+        self.num_augmentations = num_augmentations
+        
+        # Warp output, reallocated only when the face size changes
+        self._warped = None
+        
+    def augment(self, image: np.ndarray) -> np.ndarray:
+        """
+        Create augmented versions of a face image.
+        
+        Args:
+            image: Original face image (BGR format)
+            
+        Returns:
+            Array of shape (num_augmentations + 1, H, W, 3) holding the
+            original image followed by the augmented images
+        """
+        # All augmentations keep the input size, so they are written into
+        # one preallocated stack, with the original image always included
+        augmented_images = np.empty((self.num_augmentations + 1,) + image.shape, dtype=image.dtype)
+        augmented_images[0] = image
+        
+        height, width = image.shape[:2]
+        
+        if self._warped is None or self._warped.shape != image.shape or self._warped.dtype != image.dtype:
+            self._warped = np.empty_like(image)
+            
+        # Generate augmentations
+        for i in range(self.num_augmentations):
+            # Choose random augmentation techniques for this image
+            flip = random.choice([True, False])
+            brightness = random.uniform(0.7, 1.3)
+            rotation = random.uniform(-10, 10)
+            crop_percent = random.uniform(0.85, 0.95)
+            
+            # Flip, rotation, crop and resize as one warp at the output size
+            transform = _augmentation_transform(height, width, flip, rotation, crop_percent)
+            cv2.warpAffine(image, transform, (width, height), dst=self._warped, 
+                           flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
+            
+            # Brightness writes straight into the output stack
+            adjust_brightness(self._warped, brightness, out=augmented_images[i + 1])
+        
+        return augmented_images
 
 def augment_face_image(image: np.ndarray, 
-                      num_augmentations: int = 4) -> List[np.ndarray]:
+                      num_augmentations: int = 4) -> np.ndarray:
     """
     Create augmented versions of a face image.
     
@@ -17,69 +114,160 @@ def augment_face_image(image: np.ndarray,
         num_augmentations: Number of augmented images to generate
         
     Returns:
-        List of augmented images
+        Array of shape (num_augmentations + 1, H, W, 3) with the original
+        and augmented images
     """
-    augmented_images = []
+    return Augmenter(num_augmentations).augment(image)
+
+def augment_face_batch(images: List[np.ndarray], 
+                       num_augmentations: int = 4, 
+                       device: Optional[str] = None) -> np.ndarray:
+    """
+    Create augmented versions of several faces in one batched torch call.
     
-    # Original image is always included
-    augmented_images.append(image.copy())
+    Applies the same random flip, rotation, crop and brightness as
+    augment_face_image, with parameters drawn per sample, on the GPU when
+    one is available. The result can be passed straight to
+    FaceRecognizer.generate_embeddings_batch.
     
-    # Generate augmentations
-    for i in range(num_augmentations):
-        # Choose random augmentation techniques for this image
+    Args:
+        images: Face images (BGR format), resized to the size of the first one
+        num_augmentations: Number of augmented images to generate per face
+        device: Torch device to run on (default: cuda if available, else cpu)
+        
+    Returns:
+        Augmented images of shape (num_augmentations * N, H, W, 3), uint8,
+        grouped by augmentation round (originals are not included)
+    """
+    height, width = images[0].shape[:2]
+    
+    if num_augmentations <= 0:
+        return np.empty((0, height, width, 3), dtype=np.uint8)
+        
+    import torch
+    import torch.nn.functional as F
+    
+    faces = np.stack([cv2.resize(image, (width, height)) for image in images])
+    
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        
+    # (N, H, W, 3) uint8 -> (k * N, 3, H, W) float
+    batch = torch.from_numpy(faces).to(device).permute(0, 3, 1, 2).float()
+    batch = batch.repeat(num_augmentations, 1, 1, 1)
+    
+    # affine_grid maps output to input positions in [-1, 1] coordinates
+    to_normalized = np.array([
+        [2.0 / width, 0.0, 1.0 / width - 1.0],
+        [0.0, 2.0 / height, 1.0 / height - 1.0],
+        [0.0, 0.0, 1.0],
+    ])
+    
+    thetas = np.empty((len(batch), 2, 3), dtype=np.float32)
+    brightness = np.empty(len(batch), dtype=np.float32)
+    
+    for i in range(len(batch)):
         flip = random.choice([True, False])
-        brightness = random.uniform(0.7, 1.3)
         rotation = random.uniform(-10, 10)
         crop_percent = random.uniform(0.85, 0.95)
+        transform = np.vstack([_augmentation_transform(height, width, flip, rotation, crop_percent), 
+                               [0.0, 0.0, 1.0]])
         
-        # Start with original image
-        aug_img = image.copy()
-        
-        # Apply horizontal flip
-        if flip:
-            aug_img = cv2.flip(aug_img, 1)
-            
-        # Apply brightness adjustment
-        aug_img = adjust_brightness(aug_img, brightness)
+        thetas[i] = (to_normalized @ np.linalg.inv(transform) @ np.linalg.inv(to_normalized))[:2]
+        brightness[i] = random.uniform(0.7, 1.3)
         
-        # Apply rotation
-        aug_img = rotate_image(aug_img, rotation)
-        
-        # Apply random crop
-        aug_img = random_crop(aug_img, crop_percent)
+    grid = F.affine_grid(torch.from_numpy(thetas).to(device), list(batch.shape), align_corners=False)
+    warped = F.grid_sample(batch, grid, mode="bilinear", padding_mode="reflection", align_corners=False)
+    
+    # Same brightness model as adjust_brightness: capped at the brightest channel
+    peak = warped.amax(dim=1, keepdim=True).clamp(min=1.0)
+    scale = torch.minimum(torch.from_numpy(brightness).to(device).view(-1, 1, 1, 1), 255.0 / peak)
+    augmented = (warped * scale).clamp(0, 255).to(torch.uint8)
+    
+    return augmented.permute(0, 2, 3, 1).cpu().numpy()
+
+def _augmentation_transform(height: int, 
+                            width: int, 
+                            flip: bool, 
+                            rotation: float, 
+                            crop_percent: float) -> np.ndarray:
+    """
+    Compose flip, rotation, random crop and resize into one affine transform.
+    
+    Matches applying cv2.flip, rotate_image, random_crop and cv2.resize back
+    to the original size one after another.
+    
+    Args:
+        height: Image height
+        width: Image width
+        flip: Whether to flip horizontally
+        rotation: Rotation angle in degrees
+        crop_percent: Percentage of the image size to keep (0.0 to 1.0)
         
-        # Resize back to original dimensions
-        aug_img = cv2.resize(aug_img, (image.shape[1], image.shape[0]))
+    Returns:
+        2x3 affine matrix for cv2.warpAffine
+    """
+    transform = np.eye(3)
+    
+    if flip:
+        transform = np.array([[-1.0, 0.0, width - 1], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]) @ transform
         
-        augmented_images.append(aug_img)
+    rotation_matrix = cv2.getRotationMatrix2D((width // 2, height // 2), rotation, 1.0)
+    transform = np.vstack([rotation_matrix, [0.0, 0.0, 1.0]]) @ transform
     
-    return augmented_images
+    # Random crop offset, then scale the crop back up to the full size
+    crop_height = int(height * crop_percent)
+    crop_width = int(width * crop_percent)
+    x = random.randint(0, max(0, width - crop_width))
+    y = random.randint(0, max(0, height - crop_height))
+    scale_x = width / crop_width
+    scale_y = height / crop_height
+    
+    crop_resize = np.array([
+        [scale_x, 0.0, (0.5 - x) * scale_x - 0.5],
+        [0.0, scale_y, (0.5 - y) * scale_y - 0.5],
+        [0.0, 0.0, 1.0],
+    ])
+    transform = crop_resize @ transform
+    
+    return transform[:2]
 
-def adjust_brightness(image: np.ndarray, factor: float) -> np.ndarray:
+def adjust_brightness(image: np.ndarray, 
+                      factor: float, 
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Adjust the brightness of an image.
     
     Args:
         image: Input image (BGR format)
         factor: Brightness factor (1.0 = original, >1 = brighter, <1 = darker)
+        out: Optional preallocated output with the same shape and dtype as image
         
     Returns:
         Brightness-adjusted image
     """
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    hsv = hsv.astype(np.float32)
-    
-    # Adjust V channel (brightness)
-    hsv[:, :, 2] = hsv[:, :, 2] * factor
-    hsv[:, :, 2] = np.clip(hsv[:, :, 2], 0, 255)
+    # Scaling V in HSV multiplies every channel by the same factor, capped
+    # so the brightest channel saturates at 255. Do that directly in BGR
+    # instead of converting to HSV and back.
+    if out is None:
+        out = np.empty_like(image)
     
-    hsv = hsv.astype(np.uint8)
-    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+    if njit is not None:
+        _adjust_brightness_kernel(np.ascontiguousarray(image), np.float32(factor), out)
+    else:
+        peak = image.max(axis=2, keepdims=True).astype(np.float32)
+        scale = np.minimum(np.float32(factor), 255.0 / np.maximum(peak, 1.0))
+        np.multiply(image, scale, out=out, casting="unsafe")
+        
+    return out
 
 def rotate_image(image: np.ndarray, angle: float) -> np.ndarray:
     """
     Rotate an image by a specified angle.
     
+    The remap tables are cached per image size and angle, so rotating many
+    same-sized faces by the same angle builds them only once.
+    
     Args:
         image: Input image (BGR format)
         angle: Rotation angle in degrees
@@ -88,16 +276,38 @@ def rotate_image(image: np.ndarray, angle: float) -> np.ndarray:
         Rotated image
     """
     height, width = image.shape[:2]
+    map1, map2 = _rotation_maps(height, width, float(angle))
+    
+    # Apply rotation with the cached lookup tables
+    rotated = cv2.remap(image, map1, map2, cv2.INTER_LINEAR, 
+                        borderMode=cv2.BORDER_REFLECT)
+    
+    return rotated
+
+@lru_cache(maxsize=32)
+def _rotation_maps(height: int, width: int, angle: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build fixed-point remap tables rotating an image about its center.
+    
+    Args:
+        height: Image height
+        width: Image width
+        angle: Rotation angle in degrees
+        
+    Returns:
+        Tuple of maps for cv2.remap
+    """
     center = (width // 2, height // 2)
     
-    # Get rotation matrix
+    # remap needs the source position of each output pixel
     rotation_matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+    inverse = cv2.invertAffineTransform(rotation_matrix)
     
-    # Apply rotation
-    rotated = cv2.warpAffine(image, rotation_matrix, (width, height), 
-                            flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
+    xs, ys = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+    map_x = (inverse[0, 0] * xs + inverse[0, 1] * ys + inverse[0, 2]).astype(np.float32)
+    map_y = (inverse[1, 0] * xs + inverse[1, 1] * ys + inverse[1, 2]).astype(np.float32)
     
-    return rotated
+    return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
 
 def random_crop(image: np.ndarray, crop_percent: float) -> np.ndarray:
     """
@@ -141,22 +351,379 @@ def preprocess_image_for_recognition(image: np.ndarray) -> np.ndarray:
     """
     # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
     if len(image.shape) == 3:
-        # Convert to LAB color space
+        # Convert to LAB color space and equalize the L plane in place
         lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        
-        # Apply CLAHE to L channel
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-        cl = clahe.apply(l)
-        
-        # Merge channels
-        limg = cv2.merge((cl, a, b))
+        lab[:, :, 0] = _CLAHE.apply(lab[:, :, 0])
         
-        # Convert back to BGR
-        processed = cv2.cvtColor(limg, cv2.COLOR_LAB2BGR)
+        # Convert back to BGR, reusing the LAB buffer
+        processed = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=lab)
     else:
         # For grayscale images
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-        processed = clahe.apply(image)
+        processed = _CLAHE.apply(image)
+    
+    return processed
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Compute the intersection over union of every pair of boxes from two sets.
+    
+    Args:
+        boxes_a: First set of bounding boxes, shape (N, 4) as (x1, y1, x2, y2)
+        boxes_b: Second set of bounding boxes, shape (M, 4)
+        
+    Returns:
+        IoU matrix of shape (N, M)
+    """
+    boxes_a = np.ascontiguousarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.ascontiguousarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    
+    if njit is not None:
+        return _iou_matrix_kernel(boxes_a, boxes_b)
+        
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    
+    area_a = (boxes_a[:, 2:] - boxes_a[:, :2]).prod(axis=1)
+    area_b = (boxes_b[:, 2:] - boxes_b[:, :2]).prod(axis=1)
+    union = area_a[:, None] + area_b[None, :] - intersection
     
-    return processed 
\ No newline at end of file
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+class FaceTracker:
+    """
+    Remembers recently recognized faces by bounding box, so a face that
+    stays in place does not need to be embedded and searched again.
+    """
+    
+    def __init__(self, iou_threshold: float = 0.5, max_age: float = 5.0):
+        """
+        Initialize the tracker.
+        
+        Args:
+            iou_threshold: Minimum IoU for a detection to continue a track
+            max_age: Time after which an unseen track is dropped (seconds)
+        """
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self._tracks = []
+        
+    def match(self, bboxes: List[Tuple[int, int, int, int]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Match detected faces to tracked faces and refresh the matched tracks.
+        
+        Args:
+            bboxes: Bounding boxes of the detected faces (x1, y1, x2, y2)
+            
+        Returns:
+            Track for each bounding box (with person_id, similarity and
+            person_data), or None where the face has to be recognized
+        """
+        now = time.time()
+        self._tracks = [track for track in self._tracks if now - track["last_seen"] <= self.max_age]
+        
+        # IoU of every track with every detection in one call
+        ious = iou_matrix([track["bbox"] for track in self._tracks], bboxes)
+        
+        matches = []
+        matched_ids = set()
+        for j, bbox in enumerate(bboxes):
+            best_track = None
+            best_iou = self.iou_threshold
+            for i, track in enumerate(self._tracks):
+                if id(track) in matched_ids:
+                    continue
+                iou = ious[i, j]
+                if iou > best_iou:
+                    best_iou = iou
+                    best_track = track
+                    
+            if best_track is not None:
+                best_track["bbox"] = bbox
+                best_track["last_seen"] = now
+                matched_ids.add(id(best_track))
+            matches.append(best_track)
+            
+        return matches
+        
+    def add(self, 
+            bbox: Tuple[int, int, int, int], 
+            person_id: str, 
+            similarity: float, 
+            person_data: Dict[str, Any]):
+        """
+        Start tracking a recognized face.
+        
+        Args:
+            bbox: Bounding box of the face (x1, y1, x2, y2)
+            person_id: ID of the recognized person
+            similarity: Similarity score of the recognition
+            person_data: Person record
+        """
+        self._tracks.append({
+            "bbox": bbox,
+            "person_id": person_id,
+            "similarity": similarity,
+            "person_data": person_data,
+            "last_seen": time.time()
+        })
+
+def open_camera(camera_id: int, 
+                width: int = 640, 
+                height: int = 480,
+                fps: Optional[int] = None) -> cv2.VideoCapture:
+    """
+    Open a camera for low-latency capture.
+    
+    Uses V4L2 on Linux and requests MJPG frames, which USB cameras compress
+    on the device, at a fixed resolution. The driver buffer is limited to
+    one frame so reads do not return frames queued up while processing.
+    
+    Args:
+        camera_id: Camera device ID
+        width: Requested frame width
+        height: Requested frame height
+        fps: Requested frame rate (None for the camera default)
+        
+    Returns:
+        Opened video capture (check isOpened() before use)
+    """
+    backend = cv2.CAP_V4L2 if sys.platform.startswith("linux") else cv2.CAP_ANY
+    cap = cv2.VideoCapture(camera_id, backend)
+    
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps is not None:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    
+    return cap
+
+def read_latest_frame(cap: cv2.VideoCapture, 
+                      max_grabs: int = 5,
+                      image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+    """
+    Read the newest frame from a camera, skipping stale buffered frames.
+    
+    Buffered frames are grabbed without decoding until a grab has to wait
+    for the camera, and only that frame is decoded.
+    
+    Args:
+        cap: Opened video capture
+        max_grabs: Maximum number of frames to grab
+        image: Optional buffer to decode the frame into, e.g. the previous
+               frame, to avoid allocating a new image per frame
+        
+    Returns:
+        Tuple containing:
+        - Whether a frame was read
+        - The frame (BGR format), or None
+    """
+    for _ in range(max_grabs):
+        start = time.perf_counter()
+        if not cap.grab():
+            return False, None
+            
+        # A grab that waited for the camera returned a fresh frame
+        if time.perf_counter() - start > 0.005:
+            break
+            
+    return cap.retrieve(image)
+
+class TextOverlay:
+    """
+    Draw text onto frames from cached pre-rendered tiles, so each string is
+    rasterized by cv2.putText only once while it stays the same.
+    """
+    
+    def __init__(self, 
+                 font_scale: float = 0.7, 
+                 color: Tuple[int, int, int] = (0, 255, 0), 
+                 thickness: int = 2, 
+                 capacity: int = 64):
+        """
+        Initialize the overlay.
+        
+        Args:
+            font_scale: Font scale of cv2.FONT_HERSHEY_SIMPLEX
+            color: Text color (BGR format)
+            thickness: Text thickness
+            capacity: Maximum number of cached text tiles
+        """
+        self.font_scale = font_scale
+        self.color = color
+        self.thickness = thickness
+        self.capacity = capacity
+        self._tiles = OrderedDict()
+        
+    def _render(self, text: str) -> Tuple[np.ndarray, np.ndarray, Tuple[int, int]]:
+        """
+        Rasterize text into a tile of premultiplied color and a tile of
+        inverse coverage, plus the offset of the text origin in the tiles.
+        """
+        (width, height), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 
+                                                    self.font_scale, self.thickness)
+        
+        # Strokes extend past the measured box by up to the line thickness
+        pad = self.thickness
+        coverage = np.zeros((height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8)
+        cv2.putText(coverage, text, (pad, height + pad), cv2.FONT_HERSHEY_SIMPLEX, 
+                    self.font_scale, 255, self.thickness)
+        
+        # Keep the anti-aliased edges by blending with the coverage
+        alpha = coverage[..., np.newaxis].astype(np.float32) / 255.0
+        premultiplied = np.round(alpha * np.array(self.color, dtype=np.float32)).astype(np.uint8)
+        inverse_alpha = np.repeat(255 - coverage[..., np.newaxis], 3, axis=2)
+        return premultiplied, inverse_alpha, (pad, height + pad)
+        
+    def draw(self, image: np.ndarray, text: str, org: Tuple[int, int]) -> np.ndarray:
+        """
+        Draw text onto an image in place, like cv2.putText.
+        
+        Args:
+            image: Image to draw on (BGR format)
+            text: Text to draw
+            org: Bottom-left corner of the text (the cv2.putText origin)
+            
+        Returns:
+            The same image
+        """
+        tiles = self._tiles.get(text)
+        if tiles is None:
+            tiles = self._render(text)
+            self._tiles[text] = tiles
+            if len(self._tiles) > self.capacity:
+                self._tiles.popitem(last=False)
+        else:
+            self._tiles.move_to_end(text)
+            
+        tile, inverse_alpha, (offset_x, offset_y) = tiles
+        
+        # Clip the tile to the image
+        x, y = org[0] - offset_x, org[1] - offset_y
+        x1, y1 = max(x, 0), max(y, 0)
+        x2 = min(x + tile.shape[1], image.shape[1])
+        y2 = min(y + tile.shape[0], image.shape[0])
+        if x1 >= x2 or y1 >= y2:
+            return image
+            
+        # image = image * (1 - alpha) + color * alpha, in place on the region
+        roi = image[y1:y2, x1:x2]
+        cv2.multiply(roi, inverse_alpha[y1 - y:y2 - y, x1 - x:x2 - x], dst=roi, scale=1 / 255)
+        cv2.add(roi, tile[y1 - y:y2 - y, x1 - x:x2 - x], dst=roi)
+        return image
+
+class FrameGrabber:
+    """
+    Read frames from a camera in a background thread, keeping only the
+    latest one, so a slow consumer never waits for the camera nor works
+    on stale frames.
+    """
+    
+    def __init__(self, cap: cv2.VideoCapture):
+        """
+        Initialize the grabber.
+        
+        Args:
+            cap: Opened camera (see open_camera)
+        """
+        self.cap = cap
+        self.running = False
+        self._latest = None
+        self._frame_id = 0
+        self._returned_id = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        
+    def start(self) -> "FrameGrabber":
+        """Start the capture thread."""
+        self.running = True
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+        return self
+        
+    def stop(self):
+        """Stop the capture thread."""
+        self.running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+            
+    def _capture_loop(self):
+        """Read frames until stopped, replacing the previous one each time."""
+        while self.running:
+            ret, frame = self.cap.read()
+            
+            with self._condition:
+                if not ret:
+                    self.running = False
+                else:
+                    self._latest = frame
+                    self._frame_id += 1
+                self._condition.notify_all()
+                
+    def get_latest(self, timeout: float = 1.0) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Get the newest frame, waiting for one the caller has not seen yet.
+        
+        Args:
+            timeout: Maximum time to wait for a new frame (seconds)
+            
+        Returns:
+            Tuple containing:
+            - Whether a frame is available
+            - The frame (BGR format), or None
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._frame_id != self._returned_id or not self.running, 
+                                     timeout)
+            
+            if self._frame_id == self._returned_id:
+                return False, None
+                
+            self._returned_id = self._frame_id
+            return True, self._latest
+
+def downscale_frame(frame: np.ndarray, max_width: int = 640) -> Tuple[np.ndarray, float]:
+    """
+    Downscale a frame so it is at most max_width pixels wide.
+    
+    Args:
+        frame: Input frame (BGR format)
+        max_width: Maximum width of the returned frame
+        
+    Returns:
+        Tuple containing:
+        - Downscaled frame (the input frame if it is already small enough)
+        - Factor mapping coordinates in the downscaled frame back to the input
+    """
+    height, width = frame.shape[:2]
+    if width <= max_width:
+        return frame, 1.0
+        
+    scale = width / max_width
+    small = cv2.resize(frame, (max_width, round(height / scale)), interpolation=cv2.INTER_AREA)
+    return small, scale
+
+def scale_detections(metadata: List[Dict[str, Any]], scale: float) -> List[Dict[str, Any]]:
+    """
+    Map face metadata from a downscaled frame back to full resolution.
+    
+    Args:
+        metadata: List of face metadata from FaceDetector
+        scale: Factor returned by downscale_frame
+        
+    Returns:
+        The metadata, with bounding boxes and centers scaled in place
+    """
+    if scale == 1.0:
+        return metadata
+        
+    for face_meta in metadata:
+        face_meta["bbox"] = tuple(int(v * scale) for v in face_meta["bbox"])
+        face_meta["center"] = tuple(int(v * scale) for v in face_meta["center"])
+        
+    return metadata
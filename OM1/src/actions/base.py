@@ -62,6 +62,12 @@ class ActionConnector(ABC, T.Generic[OT]):
     def tick(self) -> None:
         time.sleep(60)
 
+    async def close(self) -> None:
+        """
+        Release resources held by the connector, such as network sessions
+        """
+        pass
+
 
 @dataclass
 class AgentAction:
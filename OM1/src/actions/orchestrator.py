@@ -1,6 +1,7 @@
 import asyncio
 import logging
 import threading
+import time
 import typing as T
 
 from actions.base import AgentAction
@@ -19,22 +20,35 @@ class ActionOrchestrator:
     _config: RuntimeConfig
     _impl_threads: T.Dict[str, threading.Thread]
     _connector_threads: T.Dict[str, threading.Thread]
+    _stop_event: threading.Event
+
+    # Bounds for the wait after a failing tick, so a broken action does not spin
+    _error_backoff_min = 0.1
+    _error_backoff_max = 5.0
 
     def __init__(self, config: RuntimeConfig):
         self._config = config
         self.promise_queue = []
         self._impl_threads = {}
         self._connector_threads = {}
+        self._stop_event = threading.Event()
 
     def start(self):
         """
         Start actions and connectors in separate threads
+
+        Each run gets a fresh stop event, so the orchestrator can be started
+        again after stop() without waking threads of the earlier run that
+        are still finishing a tick.
         """
+        if self._stop_event.is_set():
+            self._stop_event = threading.Event()
+
         for agent_action in self._config.agent_actions:
             if agent_action.llm_label not in self._impl_threads:
                 impl_thread = threading.Thread(
                     target=self._run_implementation_loop,
-                    args=(agent_action,),
+                    args=(agent_action, self._stop_event),
                     daemon=True,
                 )
                 self._impl_threads[agent_action.llm_label] = impl_thread
@@ -42,43 +56,93 @@ class ActionOrchestrator:
 
             if agent_action.llm_label not in self._connector_threads:
                 conn_thread = threading.Thread(
-                    target=self._run_connector_loop, args=(agent_action,), daemon=True
+                    target=self._run_connector_loop,
+                    args=(agent_action, self._stop_event),
+                    daemon=True,
                 )
                 self._connector_threads[agent_action.llm_label] = conn_thread
                 conn_thread.start()
 
         return asyncio.Future()  # Return future for compatibility
 
-    def _run_implementation_loop(self, action: AgentAction):
+    def stop(self, timeout: float = 1.0):
         """
-        Thread-based implementation loop
+        Signal the action and connector threads to exit and wait for them
+
+        Ticks that block, e.g. by sleeping, only see the stop event once they
+        return, so all threads share one deadline of timeout seconds.
         """
-        while True:
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        for thread in [*self._impl_threads.values(), *self._connector_threads.values()]:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        self._impl_threads.clear()
+        self._connector_threads.clear()
+
+    async def close(self):
+        """
+        Stop the action threads and close the connectors
+
+        The threads are joined off the event loop, so it keeps running
+        while ticks finish.
+        """
+        await asyncio.to_thread(self.stop)
+        for agent_action in self._config.agent_actions:
             try:
-                action.implementation.tick()
+                await agent_action.connector.close()
             except Exception as e:
-                logging.error(f"Error in implementation {action.llm_label}: {e}")
+                logging.error(f"Error closing connector {agent_action.llm_label}: {e}")
 
-    def _run_connector_loop(self, action: AgentAction):
+    def _run_implementation_loop(
+        self, action: AgentAction, stop_event: threading.Event
+    ):
+        """
+        Thread-based implementation loop
+        """
+        self._run_tick_loop(
+            action.implementation.tick,
+            f"implementation {action.llm_label}",
+            stop_event,
+        )
+
+    def _run_connector_loop(self, action: AgentAction, stop_event: threading.Event):
         """
         Thread-based connector loop
         """
-        while True:
+        self._run_tick_loop(
+            action.connector.tick, f"connector {action.llm_label}", stop_event
+        )
+
+    def _run_tick_loop(
+        self, tick: T.Callable[[], None], name: str, stop_event: threading.Event
+    ):
+        """
+        Call tick until stopped, backing off exponentially while it keeps failing
+
+        Ticks pace themselves by blocking, so the loop only waits after errors.
+        """
+        backoff = self._error_backoff_min
+        while not stop_event.is_set():
             try:
-                action.connector.tick()
+                tick()
+                backoff = self._error_backoff_min
             except Exception as e:
-                logging.error(f"Error in connector {action.llm_label}: {e}")
+                logging.error(f"Error in {name}: {e}")
+                stop_event.wait(backoff)
+                backoff = min(backoff * 2, self._error_backoff_max)
 
     async def flush_promises(self) -> tuple[list[T.Any], list[asyncio.Task[T.Any]]]:
         """
         Flushes the promise queue and returns the completed promises and the pending promises.
         """
-        done_promises = []
+        done_promises, pending_promises = [], []
         for promise in self.promise_queue:
             if promise.done():
                 await promise
                 done_promises.append(promise)
-        self.promise_queue = [p for p in self.promise_queue if p not in done_promises]
+            else:
+                pending_promises.append(promise)
+        self.promise_queue = pending_promises
         return done_promises, self.promise_queue
 
     async def promise(self, commands: list[Command]) -> None:
@@ -1,15 +1,158 @@
 import asyncio
 import base64
+import hashlib
 import io
 import logging
 import os
-import requests
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import aiohttp
 from pydub import AudioSegment
 from pydub.playback import play
 
 from actions.base import ActionConfig, ActionConnector
 from actions.speak.interface import SpeakInput
 
+try:
+    import miniaudio
+except ImportError:
+    miniaudio = None
+
+
+class StreamingBase64FieldDecoder:
+    """
+    Incrementally decodes a base64 string field out of a streamed JSON body,
+    so audio can be played before the whole response has arrived.
+    """
+
+    def __init__(self, field: str):
+        self._marker = f'"{field}"'.encode()
+        self._buffer = b""
+        self._pending = b""
+        self._state = "search"  # search -> value -> done
+
+    @property
+    def found(self) -> bool:
+        return self._state != "search"
+
+    def feed(self, chunk: bytes) -> bytes:
+        """Add the next piece of the body and return any newly decoded bytes"""
+        if self._state == "done":
+            return b""
+        
+        self._buffer += chunk
+        
+        if self._state == "search":
+            index = self._buffer.find(self._marker)
+            if index < 0:
+                return b""
+            rest = self._buffer[index + len(self._marker):]
+            quote = rest.find(b'"')
+            if quote < 0:
+                return b""
+            self._buffer = rest[quote + 1:]
+            self._state = "value"
+        
+        end = self._buffer.find(b'"')
+        if end >= 0:
+            value, self._state = self._buffer[:end], "done"
+        else:
+            value = self._buffer
+        self._buffer = b""
+        
+        # Base64 never contains backslashes, so dropping them undoes JSON
+        # escaping such as "\/" even when it is split across chunks
+        value = self._pending + value.replace(b"\\", b"")
+        usable = len(value) if self._state == "done" else len(value) // 4 * 4
+        self._pending = value[usable:]
+        return base64.b64decode(value[:usable])
+
+
+class QueuedAudioSource(miniaudio.StreamableSource if miniaudio else object):
+    """
+    Encoded audio fed from one thread and read by the miniaudio decoder on
+    another, so playback can start while the rest is still downloading.
+
+    Reads block until audio arrives, so the decoder must run on its own
+    thread and never in the audio device callback.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._buffer = b""
+        self._ended = False
+
+    def feed(self, data: bytes) -> None:
+        """Append encoded audio"""
+        self._queue.put(data)
+
+    def end(self) -> None:
+        """Mark the end of the audio"""
+        self._queue.put(None)
+
+    def read(self, num_bytes: int) -> bytes:
+        # Block until enough audio has arrived or the input has ended
+        while len(self._buffer) < num_bytes and not self._ended:
+            data = self._queue.get()
+            if data is None:
+                self._ended = True
+            else:
+                self._buffer += data
+        
+        data, self._buffer = self._buffer[:num_bytes], self._buffer[num_bytes:]
+        return data
+
+
+class PcmBuffer:
+    """
+    Decoded PCM handed from the decoding thread to the audio device callback.
+
+    The callback never waits: it gets whatever is buffered, and the device
+    plays silence for the rest of its period.
+    """
+
+    def __init__(self, frame_size: int):
+        self._frame_size = frame_size
+        self._chunks = deque()
+        self._buffer = b""
+        self._ended = False
+        self.finished = threading.Event()
+
+    def feed(self, data: bytes) -> None:
+        """Append decoded PCM"""
+        self._chunks.append(data)
+
+    def end(self) -> None:
+        """Mark the end of the audio"""
+        self._chunks.append(None)
+
+    def read(self, num_frames: int) -> bytes:
+        """Return up to num_frames of buffered PCM without blocking"""
+        num_bytes = num_frames * self._frame_size
+        while len(self._buffer) < num_bytes and self._chunks:
+            data = self._chunks.popleft()
+            if data is None:
+                self._ended = True
+                break
+            self._buffer += data
+        
+        data, self._buffer = self._buffer[:num_bytes], self._buffer[num_bytes:]
+        if self._ended and not self._buffer:
+            self.finished.set()
+        return data
+
+    def stream(self):
+        """Generator in the form PlaybackDevice.start expects"""
+        num_frames = yield b""
+        while True:
+            num_frames = yield self.read(num_frames)
+
 
 class SimpleElevenLabsTTSConnector(ActionConnector[SpeakInput]):
     """A simplified ElevenLabs TTS connector that directly plays audio"""
@@ -26,9 +169,38 @@ class SimpleElevenLabsTTSConnector(ActionConnector[SpeakInput]):
         # OpenMind API endpoint
         self.api_url = "https://api.openmind.org/api/core/elevenlabs/tts"
         
+        # Recently spoken audio keyed by (voice_id, model_id, text), so repeated
+        # phrases are played without another API call. It is also kept on
+        # disk, so phrases survive restarts
+        self._audio_cache = OrderedDict()
+        self._audio_cache_size = getattr(config, "audio_cache_size", 64)
+        self._audio_cache_dir = os.path.expanduser(
+            getattr(config, "audio_cache_dir", "~/.cache/sfhacks_tts")
+        )
+        self._audio_cache_disk_size = getattr(config, "audio_cache_disk_size", 512)
+        
+        # Decode and play MP3s in-process on a persistent output device, with
+        # mpg123 and pydub as fallbacks when miniaudio is unavailable. The
+        # device is opened with the sink setup, so it binds to the speaker
+        self._playback = None
+        
+        # Single player thread so utterances never overlap on the device
+        self._player = ThreadPoolExecutor(max_workers=1)
+        
+        # Stream audio into mpg123 while it downloads when it is installed
+        self._mpg123 = shutil.which("mpg123")
+        
+        # Keep-alive session so repeated utterances reuse the TLS connection,
+        # created on first use inside the event loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        
         # Log configuration
         logging.info(f"Initialized SimpleElevenLabsTTSConnector with voice: {self.voice_id}")
         logging.info(f"Using speaker device ID: {self.speaker_device_id}")
+        
+        # Set up the audio device on first playback rather than before
+        # every utterance
+        self._sink_configured = False
 
     async def connect(self, output_interface: SpeakInput) -> None:
         # Get the text to speak
@@ -38,8 +210,28 @@ class SimpleElevenLabsTTSConnector(ActionConnector[SpeakInput]):
         
         # Request TTS and play audio
         try:
+            self._ensure_sink()
+            key = (self.voice_id, self.model_id, text)
+            audio_data = self._cached_audio(key)
+            
+            if audio_data is not None:
+                logging.info("Playing cached audio")
+                success = await self._play_audio(audio_data)
+                if not success:
+                    logging.error("Failed to play audio")
+                return
+            
+            if self._playback is not None or self._mpg123:
+                audio_data = await self._stream_tts(text)
+                if audio_data is None:
+                    logging.error("Failed to stream audio")
+                else:
+                    self._cache_audio(key, audio_data)
+                return
+            
             audio_data = await self._tts_request(text)
             if audio_data:
+                self._cache_audio(key, audio_data)
                 success = await self._play_audio(audio_data)
                 if not success:
                     logging.error("Failed to play audio")
@@ -48,14 +240,151 @@ class SimpleElevenLabsTTSConnector(ActionConnector[SpeakInput]):
         except Exception as e:
             logging.error(f"Error in TTS process: {e}")
 
-    async def _tts_request(self, text):
-        """Request TTS from ElevenLabs via OpenMind API"""
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
+    def _cache_path(self, key):
+        """Path of the cached MP3 for a (voice_id, model_id, text) key"""
+        digest = hashlib.sha1("\0".join(key).encode()).hexdigest()
+        return os.path.join(self._audio_cache_dir, f"{digest}.mp3")
+
+    def _cached_audio(self, key):
+        """Return cached audio for a phrase from memory or disk, or None"""
+        audio_data = self._audio_cache.get(key)
+        if audio_data is not None:
+            self._audio_cache.move_to_end(key)
+            return audio_data
+        
+        path = self._cache_path(key)
+        try:
+            with open(path, "rb") as f:
+                audio_data = f.read()
+            # Mark the file as recently used for the disk eviction
+            os.utime(path)
+        except OSError:
+            return None
+        
+        self._remember_audio(key, audio_data)
+        return audio_data
+
+    def _remember_audio(self, key, audio_data):
+        """Keep audio in memory, evicting the least recently used entry"""
+        self._audio_cache[key] = audio_data
+        self._audio_cache.move_to_end(key)
+        while len(self._audio_cache) > self._audio_cache_size:
+            self._audio_cache.popitem(last=False)
+
+    def _cache_audio(self, key, audio_data):
+        """Store audio for a phrase in memory and on disk"""
+        self._remember_audio(key, audio_data)
+        
+        path = self._cache_path(key)
+        try:
+            os.makedirs(self._audio_cache_dir, exist_ok=True)
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(audio_data)
+            os.replace(f"{path}.tmp", path)
+            
+            # Evict the least recently used files beyond the disk limit
+            files = [entry for entry in os.scandir(self._audio_cache_dir)
+                     if entry.name.endswith(".mp3")]
+            if len(files) > self._audio_cache_disk_size:
+                files.sort(key=lambda entry: entry.stat().st_mtime)
+                for entry in files[:len(files) - self._audio_cache_disk_size]:
+                    os.unlink(entry.path)
+        except OSError as e:
+            logging.warning(f"Could not write TTS audio cache: {e}")
+
+    async def close(self) -> None:
+        """Close the HTTP session, the player thread and the output device"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        
+        self._player.shutdown(wait=False)
+        
+        if self._playback is not None:
+            self._playback.close()
+            self._playback = None
+
+    async def _init_session(self):
+        """Initialize aiohttp session if not exists."""
+        if self._session is None:
+            timeout = aiohttp.ClientTimeout(sock_connect=30, sock_read=30)
+            self._session = aiohttp.ClientSession(
+                timeout=timeout,
+                headers={
+                    "Accept": "application/json",
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {self.api_key}"
+                }
+            )
+
+    async def _stream_tts(self, text):
+        """
+        Request TTS and play the MP3 as the response arrives, in-process when
+        an output device is open and through mpg123 otherwise.
+        Returns the played MP3 bytes, or None on failure.
+        """
+        data = {
+            "text": text,
+            "voice_id": self.voice_id,
+            "model_id": self.model_id
         }
         
+        logging.info(f"Streaming TTS for: '{text}'")
+        
+        await self._init_session()
+        
+        async with self._session.post(self.api_url, json=data) as response:
+            if response.status != 200:
+                logging.error(f"API Error: {response.status}")
+                logging.error(await response.text())
+                return None
+            
+            decoder = StreamingBase64FieldDecoder("response")
+            if self._playback is not None:
+                source = QueuedAudioSource()
+                playing = asyncio.wrap_future(self._player.submit(self._play_source, source))
+                player = None
+            else:
+                player = await asyncio.create_subprocess_exec(
+                    self._mpg123, "-q", "-", stdin=asyncio.subprocess.PIPE
+                )
+            
+            audio_chunks = []
+            try:
+                async for chunk in response.content.iter_chunked(4096):
+                    audio = decoder.feed(chunk)
+                    if not audio:
+                        continue
+                    audio_chunks.append(audio)
+                    if player is None:
+                        source.feed(audio)
+                    else:
+                        # Wait while mpg123 is behind instead of blocking the loop
+                        player.stdin.write(audio)
+                        await player.stdin.drain()
+            finally:
+                if player is None:
+                    source.end()
+                else:
+                    player.stdin.close()
+        
+        if player is None:
+            try:
+                await playing
+            except Exception as e:
+                logging.error(f"miniaudio playback failed: {e}")
+                return None
+        elif await player.wait() != 0:
+            return None
+        
+        if not decoder.found:
+            logging.error("No audio data in response")
+            return None
+        
+        return b"".join(audio_chunks)
+
+    async def _tts_request(self, text):
+        """Request TTS from ElevenLabs via OpenMind API"""
         data = {
             "text": text,
             "voice_id": self.voice_id,
@@ -64,20 +393,21 @@ class SimpleElevenLabsTTSConnector(ActionConnector[SpeakInput]):
         
         logging.info(f"Requesting TTS for: '{text}'")
         
-        # Run the request in a thread pool to avoid blocking
-        loop = asyncio.get_running_loop()
-        response = await loop.run_in_executor(
-            None, 
-            lambda: requests.post(self.api_url, json=data, headers=headers)
-        )
+        await self._init_session()
         
-        if response.status_code != 200:
-            logging.error(f"API Error: {response.status_code}")
-            logging.error(response.text)
-            return None
+        async with self._session.post(self.api_url, json=data) as response:
+            if response.status != 200:
+                logging.error(f"API Error: {response.status}")
+                logging.error(await response.text())
+                return None
+            
+            try:
+                json_response = await response.json(content_type=None)
+            except Exception as e:
+                logging.error(f"Error processing API response: {e}")
+                return None
         
         try:
-            json_response = response.json()
             if 'response' not in json_response:
                 logging.error("No audio data in response")
                 return None
@@ -91,16 +421,24 @@ class SimpleElevenLabsTTSConnector(ActionConnector[SpeakInput]):
 
     async def _play_audio(self, audio_data):
         """Play audio data through the USB speaker"""
-        # Set up audio device
-        os.system(f"pactl set-default-sink {self.speaker_device_id}")
-        os.system(f"pactl set-sink-mute {self.speaker_device_id} 0")
-        os.system(f"pactl set-sink-volume {self.speaker_device_id} 100%")
+        self._ensure_sink()
         
         # Try multiple playback methods
+        loop = asyncio.get_running_loop()
+        
+        # 1. Decode in-process on the open output device
+        if self._playback is not None:
+            try:
+                await loop.run_in_executor(
+                    self._player,
+                    lambda: self._play_with_miniaudio(audio_data)
+                )
+                return True
+            except Exception as e:
+                logging.error(f"miniaudio playback failed: {e}")
         
-        # 1. Try pydub first
+        # 2. Fall back to pydub
         try:
-            loop = asyncio.get_running_loop()
             await loop.run_in_executor(
                 None,
                 lambda: self._play_with_pydub(audio_data)
@@ -109,16 +447,14 @@ class SimpleElevenLabsTTSConnector(ActionConnector[SpeakInput]):
         except Exception as e:
             logging.error(f"pydub playback failed: {e}")
         
-        # 2. Fall back to mpg123
+        # 3. Fall back to mpg123
         try:
             import tempfile
-            import subprocess
             
             with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_file:
                 temp_filename = temp_file.name
                 temp_file.write(audio_data)
             
-            loop = asyncio.get_running_loop()
             await loop.run_in_executor(
                 None,
                 lambda: subprocess.run(["mpg123", temp_filename], check=True)
@@ -131,7 +467,78 @@ class SimpleElevenLabsTTSConnector(ActionConnector[SpeakInput]):
             logging.error(f"mpg123 playback failed: {e}")
             return False
     
+    def _ensure_sink(self):
+        """
+        Select and unmute the USB speaker, once per session, and open the
+        output device on it
+        """
+        if self._sink_configured:
+            return
+        self._sink_configured = True
+        
+        sink = str(self.speaker_device_id)
+        commands = [
+            ["pactl", "set-default-sink", sink],
+            ["pactl", "set-sink-mute", sink, "0"],
+            ["pactl", "set-sink-volume", sink, "100%"],
+        ]
+        
+        for command in commands:
+            try:
+                subprocess.run(
+                    command,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    check=False
+                )
+            except OSError as e:
+                logging.warning(f"Could not configure speaker with pactl: {e}")
+                break
+        
+        if miniaudio is not None:
+            try:
+                self._playback = miniaudio.PlaybackDevice(
+                    output_format=miniaudio.SampleFormat.SIGNED16,
+                    nchannels=2,
+                    sample_rate=44100
+                )
+            except miniaudio.MiniaudioError as e:
+                logging.warning(f"Could not open audio output device: {e}")
+
     def _play_with_pydub(self, audio_data):
         """Helper method to play audio with pydub"""
         audio = AudioSegment.from_file(io.BytesIO(audio_data), format="mp3")
-        play(audio)
\ No newline at end of file
+        play(audio)
+
+    def _play_with_miniaudio(self, audio_data):
+        """Helper method to play MP3 bytes on the open output device"""
+        source = QueuedAudioSource()
+        source.feed(audio_data)
+        source.end()
+        self._play_source(source)
+
+    def _play_source(self, source):
+        """Decode MP3 audio from a source and block until it has been played"""
+        # Decode on this thread, where waiting for the download is fine, and
+        # let the device callback only take from the decoded buffer
+        decoded = miniaudio.stream_any(
+            source,
+            source_format=miniaudio.FileFormat.MP3,
+            output_format=self._playback.format,
+            nchannels=self._playback.nchannels,
+            sample_rate=self._playback.sample_rate
+        )
+        pcm = PcmBuffer(self._playback.sample_width * self._playback.nchannels)
+        stream = pcm.stream()
+        next(stream)
+        
+        self._playback.start(stream)
+        try:
+            for samples in decoded:
+                pcm.feed(samples.tobytes())
+            pcm.end()
+            pcm.finished.wait()
+            # Let the device drain its buffer before stopping it
+            time.sleep(self._playback.buffersize_msec / 1000)
+        finally:
+            self._playback.stop()
\ No newline at end of file
@@ -1,6 +1,5 @@
 # src/actions/speak/connector/zenoh_speak.py
 import logging
-import time
 
 import zenoh
 from actions.base import ActionConfig, ActionConnector
@@ -13,6 +12,7 @@ class ZenohSpeakConnector(ActionConnector[SpeakInput]):
     def __init__(self, config: ActionConfig):
         super().__init__(config)
         self.session = None
+        self.publisher = None
 
         # Get URID (robot ID)
         URID = getattr(self.config, "URID", None)
@@ -28,13 +28,15 @@ class ZenohSpeakConnector(ActionConnector[SpeakInput]):
         # Initialize Zenoh session
         try:
             self.session = zenoh.open(zenoh.Config())
+            # Declare the publisher once so puts skip key expression resolution
+            self.publisher = self.session.declare_publisher(self.speak_topic)
             logging.info("Zenoh client opened for speech")
         except Exception as e:
             logging.error(f"Error opening Zenoh client for speech: {e}")
 
     async def connect(self, output_interface: SpeakInput) -> None:
         """Called when the agent wants to speak"""
-        if self.session is None:
+        if self.publisher is None:
             logging.info("No open Zenoh session for speech, returning")
             return
         
@@ -45,8 +47,4 @@ class ZenohSpeakConnector(ActionConnector[SpeakInput]):
         logging.info(f"Sending speech command: {text}")
         
         # Send the speech text over Zenoh
-        self.session.put(self.speak_topic, text)
-
-    def tick(self) -> None:
-        """Called regularly by the agent system"""
-        time.sleep(0.1)
\ No newline at end of file
+        self.publisher.put(text)
\ No newline at end of file
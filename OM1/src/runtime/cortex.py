@@ -53,7 +53,8 @@ class CortexRuntime:
         Start the runtime's main execution loop.
 
         This method initializes input listeners and begins the cortex
-        processing loop, running them concurrently.
+        processing loop, running them concurrently. The action connectors
+        are closed when it ends.
 
         Returns
         -------
@@ -65,9 +66,12 @@ class CortexRuntime:
         simulator_start = self._start_simulator_task()
         action_start = self._start_action_task()
 
-        await asyncio.gather(
-            input_listener_task, cortex_loop_task, simulator_start, action_start
-        )
+        try:
+            await asyncio.gather(
+                input_listener_task, cortex_loop_task, simulator_start, action_start
+            )
+        finally:
+            await self.action_orchestrator.close()
 
     async def _start_input_listeners(self) -> asyncio.Task:
         """
@@ -61,12 +61,14 @@ class SimulatorOrchestrator:
         tuple[list[Any], list[asyncio.Task[Any]]]
             A tuple containing the completed promises and the pending promises
         """
-        done_promises = []
+        done_promises, pending_promises = [], []
         for promise in self.promise_queue:
             if promise.done():
                 await promise
                 done_promises.append(promise)
-        self.promise_queue = [p for p in self.promise_queue if p not in done_promises]
+            else:
+                pending_promises.append(promise)
+        self.promise_queue = pending_promises
         return done_promises, self.promise_queue
 
     async def promise(self, commands: T.List[Command]) -> None:
@@ -0,0 +1,157 @@
+import base64
+import json
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from actions.base import ActionConfig
+from actions.speak.connector import simple_elevenlabs_tts
+from actions.speak.connector.simple_elevenlabs_tts import (
+    PcmBuffer,
+    QueuedAudioSource,
+    SimpleElevenLabsTTSConnector,
+    StreamingBase64FieldDecoder,
+)
+
+AUDIO = bytes(range(256)) * 8
+
+
+def decode_in_chunks(body: bytes, chunk_size: int) -> bytes:
+    decoder = StreamingBase64FieldDecoder("response")
+    decoded = b"".join(
+        decoder.feed(body[i : i + chunk_size]) for i in range(0, len(body), chunk_size)
+    )
+    assert decoder.found
+    return decoded
+
+
+def test_decoder_chunked_input():
+    """Test that the field decodes the same for any chunking of the body."""
+    body = json.dumps({"status": "ok", "response": base64.b64encode(AUDIO).decode()})
+
+    for chunk_size in (1, 3, 7, 64, len(body)):
+        assert decode_in_chunks(body.encode(), chunk_size) == AUDIO
+
+
+def test_decoder_escaped_slashes():
+    """Test that JSON-escaped slashes are undone, also when split across chunks."""
+    encoded = base64.b64encode(AUDIO).decode()
+    assert "/" in encoded
+    body = '{"response": "' + encoded.replace("/", "\\/") + '", "done": true}'
+
+    for chunk_size in (1, 2, 5, len(body)):
+        assert decode_in_chunks(body.encode(), chunk_size) == AUDIO
+
+
+def test_decoder_missing_field():
+    """Test that a body without the field decodes to nothing."""
+    decoder = StreamingBase64FieldDecoder("response")
+
+    assert decoder.feed(b'{"error": "quota exceeded"}') == b""
+    assert not decoder.found
+
+
+def test_queued_source_reads_across_feeds():
+    """Test that reads combine fed chunks and return the rest after the end."""
+    source = QueuedAudioSource()
+    source.feed(b"abc")
+    source.feed(b"defg")
+    source.end()
+
+    assert source.read(5) == b"abcde"
+    assert source.read(5) == b"fg"
+    assert source.read(5) == b""
+
+
+def test_queued_source_waits_for_audio():
+    """Test that a read on the decoder thread waits for audio fed later."""
+    source = QueuedAudioSource()
+    threading.Timer(0.05, source.feed, args=(b"1234",)).start()
+
+    assert source.read(4) == b"1234"
+
+
+def test_pcm_buffer_never_blocks():
+    """Test that the device callback gets what is buffered without waiting."""
+    pcm = PcmBuffer(frame_size=4)
+    stream = pcm.stream()
+    next(stream)
+
+    assert stream.send(2) == b""
+    pcm.feed(b"x" * 12)
+    assert stream.send(2) == b"x" * 8
+    assert not pcm.finished.is_set()
+
+    pcm.end()
+    assert stream.send(2) == b"x" * 4
+    assert pcm.finished.is_set()
+
+
+def test_output_device_opened_after_sink_setup():
+    """Test that the output device is opened only once the speaker is the default sink."""
+    calls = []
+    connector = SimpleElevenLabsTTSConnector(ActionConfig(speaker_device_id=3))
+
+    with (
+        patch.object(
+            simple_elevenlabs_tts.subprocess,
+            "run",
+            side_effect=lambda command, **kwargs: calls.append(command[1]),
+        ),
+        patch.object(
+            simple_elevenlabs_tts.miniaudio,
+            "PlaybackDevice",
+            side_effect=lambda **kwargs: calls.append("open"),
+        ),
+    ):
+        assert calls == []
+        connector._ensure_sink()
+        connector._ensure_sink()
+
+    assert calls == ["set-default-sink", "set-sink-mute", "set-sink-volume", "open"]
+
+
+def test_audio_cache_survives_restart(tmp_path):
+    """Test that cached audio is found on disk by a new connector."""
+    config = ActionConfig(audio_cache_dir=str(tmp_path))
+    key = ("voice", "model", "Hello")
+    SimpleElevenLabsTTSConnector(config)._cache_audio(key, b"mp3 bytes")
+
+    connector = SimpleElevenLabsTTSConnector(config)
+
+    assert connector._cached_audio(key) == b"mp3 bytes"
+    assert connector._cached_audio(("voice", "model", "Bye")) is None
+
+
+def test_audio_cache_disk_limit(tmp_path):
+    """Test that the least recently used files are evicted beyond the disk limit."""
+    connector = SimpleElevenLabsTTSConnector(
+        ActionConfig(
+            audio_cache_dir=str(tmp_path), audio_cache_disk_size=2, audio_cache_size=0
+        )
+    )
+    keys = [("voice", "model", text) for text in ("a", "b", "c")]
+    for mtime, key in enumerate(keys[:2]):
+        connector._cache_audio(key, key[2].encode())
+        os.utime(connector._cache_path(key), (mtime, mtime))
+
+    connector._cache_audio(keys[2], b"c")
+
+    assert connector._cached_audio(keys[0]) is None
+    assert connector._cached_audio(keys[1]) == b"b"
+    assert connector._cached_audio(keys[2]) == b"c"
+
+
+@pytest.mark.asyncio
+async def test_close_closes_session():
+    """Test that closing the connector closes its HTTP session."""
+    connector = SimpleElevenLabsTTSConnector(ActionConfig())
+    await connector._init_session()
+    session = connector._session
+
+    await connector.close()
+
+    assert session.closed
+    assert connector._session is None
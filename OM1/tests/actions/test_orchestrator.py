@@ -0,0 +1,207 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from unittest.mock import Mock
+
+import pytest
+
+from actions.base import (
+    ActionConfig,
+    ActionConnector,
+    ActionImplementation,
+    AgentAction,
+    Interface,
+)
+from actions.orchestrator import ActionOrchestrator
+from llm.output_model import Command
+from runtime.config import RuntimeConfig
+
+
+@dataclass
+class MockInput:
+    action: str
+
+
+@dataclass
+class MockOutput:
+    result: str
+
+
+@dataclass
+class MockInterface(Interface[MockInput, MockOutput]):
+    input: MockInput
+    output: MockOutput
+
+
+class MockImplementation(ActionImplementation[MockInput, MockOutput]):
+    async def execute(self, input_protocol: MockInput) -> MockOutput:
+        return MockOutput(result=f"Processed: {input_protocol.action}")
+
+    def tick(self) -> None:
+        time.sleep(0.01)
+
+
+class SlowImplementation(MockImplementation):
+    def tick(self) -> None:
+        time.sleep(0.5)
+
+
+class MockConnector(ActionConnector[MockOutput]):
+    def __init__(self, config: ActionConfig):
+        super().__init__(config)
+        self.outputs = []
+        self.tick_count = 0
+        self.closed = False
+
+    async def connect(self, input_protocol: MockOutput) -> None:
+        self.outputs.append(input_protocol)
+
+    def tick(self) -> None:
+        self.tick_count += 1
+        raise RuntimeError("connector unavailable")
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def agent_action():
+    config = ActionConfig()
+    return AgentAction(
+        name="test_action",
+        llm_label="test",
+        interface=MockInterface,
+        implementation=MockImplementation(config),
+        connector=MockConnector(config),
+    )
+
+
+@pytest.fixture
+def orchestrator(agent_action):
+    config = Mock(spec=RuntimeConfig)
+    config.agent_actions = [agent_action]
+    orchestrator = ActionOrchestrator(config)
+    yield orchestrator
+    orchestrator.stop()
+
+
+@pytest.mark.asyncio
+async def test_start_and_stop_threads(orchestrator):
+    """Test that action threads start and exit once stopped."""
+    future = orchestrator.start()
+
+    assert isinstance(future, asyncio.Future)
+    threads = [
+        *orchestrator._impl_threads.values(),
+        *orchestrator._connector_threads.values(),
+    ]
+    assert len(threads) == 2
+    for thread in threads:
+        assert thread.is_alive()
+        assert thread.daemon is True
+
+    orchestrator.stop()
+
+    for thread in threads:
+        assert not thread.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_close_stops_threads_and_closes_connectors(orchestrator, agent_action):
+    """Test that closing stops the action threads and closes each connector."""
+    orchestrator.start()
+    threads = list(orchestrator._connector_threads.values())
+
+    await orchestrator.close()
+
+    assert agent_action.connector.closed
+    for thread in threads:
+        assert not thread.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_failing_tick_backs_off(orchestrator, agent_action):
+    """Test that a tick raising errors is retried with backoff instead of spinning."""
+    orchestrator.start()
+    await asyncio.sleep(0.5)
+
+    # 0.1 + 0.2 s of backoff fit in the window, so only a few retries happen
+    assert 1 <= agent_action.connector.tick_count <= 4
+
+
+@pytest.mark.asyncio
+async def test_promise_and_flush(orchestrator, agent_action):
+    """Test that promised commands reach the connector."""
+    await orchestrator.promise([Command(type="test", value="hello")])
+    await asyncio.sleep(0.01)
+
+    done, pending = await orchestrator.flush_promises()
+
+    assert len(done) == 1
+    assert len(pending) == 0
+    assert agent_action.connector.outputs == [MockOutput(result="Processed: hello")]
+
+
+@pytest.mark.asyncio
+async def test_restart_after_stop(orchestrator):
+    """Test that an orchestrator runs its threads again after being stopped."""
+    orchestrator.start()
+    orchestrator.stop()
+
+    orchestrator.start()
+    threads = list(orchestrator._impl_threads.values())
+    await asyncio.sleep(0.05)
+
+    assert len(threads) == 1
+    assert threads[0].is_alive()
+
+
+@pytest.mark.asyncio
+async def test_stop_shares_timeout_between_threads():
+    """Test that stopping several blocked threads waits one timeout in total."""
+    config = Mock(spec=RuntimeConfig)
+    action_config = ActionConfig()
+    config.agent_actions = [
+        AgentAction(
+            name=f"slow_{i}",
+            llm_label=f"slow_{i}",
+            interface=MockInterface,
+            implementation=SlowImplementation(action_config),
+            connector=MockConnector(action_config),
+        )
+        for i in range(4)
+    ]
+    orchestrator = ActionOrchestrator(config)
+    orchestrator.start()
+    await asyncio.sleep(0.05)
+
+    start = time.monotonic()
+    orchestrator.stop(timeout=0.2)
+
+    assert time.monotonic() - start < 0.4
+
+
+@pytest.mark.asyncio
+async def test_close_does_not_block_event_loop(agent_action):
+    """Test that other coroutines keep running while close joins the threads."""
+    config = Mock(spec=RuntimeConfig)
+    agent_action.implementation = SlowImplementation(ActionConfig())
+    config.agent_actions = [agent_action]
+    orchestrator = ActionOrchestrator(config)
+    orchestrator.start()
+    await asyncio.sleep(0.05)
+
+    ticks = 0
+
+    async def count():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    counter = asyncio.create_task(count())
+    await orchestrator.close()
+    counter.cancel()
+
+    assert ticks > 5
+    assert agent_action.connector.closed
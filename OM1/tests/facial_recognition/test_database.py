@@ -0,0 +1,63 @@
+import gc
+import weakref
+
+import numpy as np
+from facial_recognition import database as database_module
+from facial_recognition.database import PersonDatabase
+
+
+def make_database(tmp_path):
+    return PersonDatabase(
+        str(tmp_path / "person_database.json"), str(tmp_path / "images")
+    )
+
+
+def test_mutations_are_written_on_flush(tmp_path):
+    """Test that mutations stay in memory until flush writes them."""
+    db = make_database(tmp_path)
+    person_id = db.add_person("Alice", "Granddaughter")
+    db.add_embedding(person_id, [3.0, 4.0])
+
+    assert not db.database_path.exists()
+    assert db.flush()
+    assert db.flush()
+
+    reloaded = make_database(tmp_path)
+    assert reloaded.get_person(person_id)["name"] == "Alice"
+    matrix, ids = reloaded.get_embedding_matrix()
+    np.testing.assert_allclose(matrix, [[3.0, 4.0]])
+    assert list(ids) == [person_id]
+
+
+def test_flush_at_exit(tmp_path):
+    """Test that pending changes of live databases are written at exit."""
+    db = make_database(tmp_path)
+    db.add_person("Bob", "Friend", person_id="bob")
+
+    database_module._flush_open_databases()
+
+    assert "bob" in make_database(tmp_path).database
+
+
+def test_database_not_kept_alive(tmp_path):
+    """Test that the exit hook does not keep databases alive."""
+    db = make_database(tmp_path)
+    ref = weakref.ref(db)
+
+    del db
+    gc.collect()
+
+    assert ref() is None
+
+
+def test_remove_person_updates_matrix(tmp_path):
+    """Test that the embedding matrix is rebuilt after a person is removed."""
+    db = make_database(tmp_path)
+    for person_id in ("a", "b"):
+        db.add_person(person_id, "Friend", person_id=person_id)
+        db.add_embedding(person_id, [1.0, 0.0])
+    assert len(db.get_embedding_matrix()[0]) == 2
+
+    db.remove_person("a")
+
+    assert list(db.get_embedding_matrix()[1]) == ["b"]
@@ -0,0 +1,85 @@
+import json
+
+import numpy as np
+from facial_recognition.embedding_store import (
+    embeddings_path,
+    load_embedding_store,
+    load_person_records,
+    save_embedding_store,
+)
+
+
+def make_database():
+    rng = np.random.default_rng(0)
+    return {
+        "alice": {"name": "Alice", "embeddings": list(rng.normal(size=(2, 8)) * 3)},
+        "nobody": {"name": "Nobody", "embeddings": []},
+        "bob": {"name": "Bob", "embeddings": list(rng.normal(size=(1, 8)))},
+    }
+
+
+def test_round_trip_keeps_raw_embeddings(tmp_path):
+    """Test that embeddings are saved unnormalized and read back unchanged."""
+    database = make_database()
+    db_path = tmp_path / "face_database.json"
+
+    assert save_embedding_store(database, db_path) == 3
+
+    loaded = load_person_records(db_path)
+    assert list(loaded) == ["alice", "nobody", "bob"]
+    for person_id, person_data in database.items():
+        assert loaded[person_id]["name"] == person_data["name"]
+        np.testing.assert_allclose(
+            np.reshape(loaded[person_id]["embeddings"], (-1, 8)),
+            np.reshape(person_data["embeddings"], (-1, 8)).astype(np.float32),
+        )
+
+
+def test_json_names_the_matrix(tmp_path):
+    """Test that the JSON file holds the person records and names the matrix file."""
+    db_path = tmp_path / "face_database.json"
+    save_embedding_store(make_database(), db_path)
+
+    data = json.loads(db_path.read_text())
+
+    assert data["embeddings"] == "face_database.npy"
+    assert embeddings_path(db_path).exists()
+    assert data["persons"]["bob"]["row_start"] == 2
+    assert "embeddings" not in data["persons"]["alice"]
+
+
+def test_load_store_maps_rows_to_persons(tmp_path):
+    """Test that the memory-mapped matrix rows map back to their owners."""
+    db_path = tmp_path / "face_database.json"
+    save_embedding_store(make_database(), db_path)
+
+    matrix, owner_ids, persons = load_embedding_store(db_path)
+
+    assert isinstance(matrix, np.memmap)
+    assert matrix.shape == (3, 8)
+    assert list(owner_ids) == ["alice", "alice", "bob"]
+    assert persons["nobody"]["row_start"] == persons["nobody"]["row_end"]
+
+
+def test_load_legacy_json(tmp_path):
+    """Test that databases with inline embedding lists still load."""
+    database = make_database()
+    db_path = tmp_path / "face_database.json"
+    db_path.write_text(
+        json.dumps(
+            {
+                person_id: {
+                    **person_data,
+                    "embeddings": [
+                        list(map(float, e)) for e in person_data["embeddings"]
+                    ],
+                }
+                for person_id, person_data in database.items()
+            }
+        )
+    )
+
+    matrix, owner_ids, _ = load_embedding_store(db_path)
+
+    assert list(owner_ids) == ["alice", "alice", "bob"]
+    np.testing.assert_allclose(matrix[2], database["bob"]["embeddings"][0], rtol=1e-6)
@@ -0,0 +1,44 @@
+import importlib.util
+import sys
+
+import numpy as np
+import pytest
+from facial_recognition import face_detector
+
+
+@pytest.fixture
+def numpy_box_geometry(monkeypatch):
+    """The NumPy fallback of _box_geometry, used when numba is missing."""
+    spec = importlib.util.spec_from_file_location(
+        "face_detector_without_numba", face_detector.__file__
+    )
+    module = importlib.util.module_from_spec(spec)
+    with monkeypatch.context() as patch:
+        patch.setitem(sys.modules, "numba", None)
+        spec.loader.exec_module(module)
+    assert module.njit is None
+    return module._box_geometry
+
+
+def test_box_geometry_paths_agree(numpy_box_geometry):
+    """Test that the numba and NumPy box geometry give identical results."""
+    rng = np.random.default_rng(0)
+    top_left = rng.uniform(-20, 600, (50, 2))
+    boxes = np.hstack([top_left, top_left + rng.uniform(1, 200, (50, 2))]).astype(
+        np.float32
+    )
+
+    expected = numpy_box_geometry(boxes, 640, 480, face_detector.CROP_MARGIN)
+    result = face_detector._box_geometry(boxes, 640, 480, face_detector.CROP_MARGIN)
+
+    assert result.dtype == expected.dtype == np.int32
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_box_geometry_layout(numpy_box_geometry):
+    """Test the box, center and clipped margin box columns."""
+    boxes = np.array([[10.7, 20.2, 110.9, 220.5]], dtype=np.float32)
+
+    (geometry,) = numpy_box_geometry(boxes, 115, 480, 0.1)
+
+    assert list(geometry) == [10, 20, 110, 220, 60, 120, 0, 0, 115, 240]
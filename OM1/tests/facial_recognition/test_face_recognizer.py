@@ -0,0 +1,136 @@
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+from facial_recognition import face_recognizer
+from facial_recognition.face_recognizer import FaceRecognizer
+
+PERSONS = {
+    "alice": {"name": "Alice"},
+    "bob": {"name": "Bob"},
+}
+
+
+@pytest.fixture(autouse=True)
+def no_model(monkeypatch):
+    model = Mock(input_shape=(160, 160))
+    monkeypatch.setattr(face_recognizer.DeepFace, "build_model", lambda name: model)
+    monkeypatch.setattr(FaceRecognizer, "_configure_tensorflow", Mock())
+
+
+@pytest.fixture(params=["faiss", "numpy"])
+def search_backend(request, monkeypatch):
+    if request.param == "faiss" and face_recognizer.faiss is None:
+        pytest.skip("faiss not installed")
+    if request.param == "numpy":
+        monkeypatch.setattr(face_recognizer, "faiss", None)
+    return request.param
+
+
+def make_embeddings():
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(6, 128)).astype(np.float32) * 5
+    owner_ids = np.array(["alice"] * 3 + ["bob"] * 3)
+    return matrix, owner_ids
+
+
+@pytest.mark.parametrize("quantization", [None, "int8"])
+def test_recognize_unnormalized_rows(search_backend, quantization):
+    """Test that raw stored rows match queries at any scale of the query."""
+    matrix, owner_ids = make_embeddings()
+    recognizer = FaceRecognizer(quantization=quantization)
+    recognizer.set_embeddings(matrix, owner_ids, PERSONS)
+
+    results = recognizer.recognize_embeddings(matrix[[1, 4]] * 0.1)
+
+    assert [person_id for person_id, _, _ in results] == ["alice", "bob"]
+    for _, similarity, _ in results:
+        assert similarity == pytest.approx(1.0, abs=0.01)
+    assert results[1][2] == {"name": "Bob"}
+
+
+def test_recognize_below_threshold(search_backend):
+    """Test that faces unlike every stored one are unknown."""
+    matrix, owner_ids = make_embeddings()
+    recognizer = FaceRecognizer(recognition_threshold=0.6)
+    recognizer.set_embeddings(matrix, owner_ids, PERSONS)
+
+    query = np.random.default_rng(1).normal(size=(1, 128))
+
+    ((person_id, _, person_data),) = recognizer.recognize_embeddings(query)
+
+    assert person_id == "unknown"
+    assert person_data == {}
+
+
+def test_empty_database(search_backend):
+    """Test that every face is unknown without stored embeddings."""
+    recognizer = FaceRecognizer()
+    recognizer.set_embeddings(np.zeros((0, 0), dtype=np.float32), np.array([]), {})
+
+    assert recognizer.recognize_embeddings(np.ones((2, 128))) == [
+        ("unknown", 0.0, {}),
+        ("unknown", 0.0, {}),
+    ]
+
+
+def test_int8_drops_float_rows(search_backend):
+    """Test that quantized search does not keep the float matrix in memory."""
+    matrix, owner_ids = make_embeddings()
+    recognizer = FaceRecognizer(quantization="int8")
+    recognizer.set_embeddings(matrix, owner_ids, PERSONS)
+
+    assert recognizer._matrix is None
+
+
+def test_pq_requires_faiss(monkeypatch):
+    """Test that product quantization is rejected without Faiss."""
+    monkeypatch.setattr(face_recognizer, "faiss", None)
+
+    with pytest.raises(ValueError):
+        FaceRecognizer(quantization="pq")
+
+
+def test_quantize_int8_round_trip():
+    """Test that int8 codes times their row scales approximate the rows."""
+    matrix, _ = make_embeddings()
+
+    codes, scales = face_recognizer.quantize_int8(matrix)
+
+    assert codes.dtype == np.int8
+    np.testing.assert_allclose(codes * scales[:, np.newaxis], matrix, atol=scales.max())
+
+
+@pytest.mark.parametrize("count", [1, 5, 200])
+def test_prepare_stack_matches_single_faces(count):
+    """Test that preparing a stack equals preparing each face on its own."""
+    recognizer = FaceRecognizer()
+    faces = np.random.default_rng(0).integers(
+        0, 256, (count, 97, 75, 3), dtype=np.uint8
+    )
+
+    stacked = recognizer._prepare_stack(faces)
+
+    assert stacked.dtype == np.float32
+    np.testing.assert_array_equal(
+        stacked, np.stack([recognizer._prepare_face(face) for face in faces])
+    )
+
+
+@pytest.mark.parametrize(
+    "latency, expected",
+    [
+        (None, False),
+        ('{"float_ms": 10.0, "int8_ms": 6.0}', True),
+        ('{"float_ms": 10.0, "int8_ms": 14.0}', False),
+        ("not json", False),
+    ],
+)
+def test_int8_model_used_only_when_faster(tmp_path, latency, expected):
+    """Test that the int8 model is only preferred when it was measured faster."""
+    onnx_path = tmp_path / "facenet.onnx"
+    (tmp_path / "facenet_int8.onnx").write_bytes(b"")
+    if latency is not None:
+        (tmp_path / "facenet_int8.json").write_text(latency)
+
+    assert face_recognizer.int8_model_is_faster(str(onnx_path)) is expected
@@ -0,0 +1,106 @@
+import cv2
+import numpy as np
+import pytest
+from facial_recognition import robot_integration
+from facial_recognition.robot_integration import EmbeddingCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(robot_integration.time, "time", lambda: now[0])
+    return now
+
+
+def make_frame(seed):
+    """A blurred camera frame with a face-like drawing of random colors."""
+    rng = np.random.default_rng(seed)
+
+    def color(low, high):
+        return tuple(int(value) for value in rng.integers(low, high, 3))
+
+    frame = np.full((480, 640, 3), color(40, 200), dtype=np.uint8)
+    cv2.ellipse(frame, (260, 200), (50, 68), 0, 0, 360, color(90, 230), -1)
+    cv2.ellipse(frame, (260, 145), (52, 25), 0, 180, 360, color(0, 80), -1)
+    for x in (240, 280):
+        cv2.circle(frame, (x, 190), 6, (30, 30, 30), -1)
+    cv2.ellipse(frame, (260, 230), (18, 6), 0, 0, 360, (40, 40, 150), -1)
+    return cv2.GaussianBlur(frame, (5, 5), 1.0)
+
+
+def crop(frame, bbox, rng):
+    """Crop a face box from a frame with Gaussian sensor noise (sigma 2)."""
+    x1, y1, x2, y2 = bbox
+    face = frame[y1:y2, x1:x2].astype(np.float32)
+    face += rng.normal(0.0, 2.0, face.shape)
+    return np.clip(face, 0, 255).astype(np.uint8)
+
+
+BBOX = (200, 120, 320, 280)
+
+
+def test_cache_hits_same_face_with_noise_and_jitter():
+    """Test that noisy crops of the same face, shifted by 1-2 px, hit the cache."""
+    rng = np.random.default_rng(0)
+    frame = make_frame(0)
+    cache = EmbeddingCache()
+    cache.put(EmbeddingCache.thumbnail(crop(frame, BBOX, rng)), np.ones(4))
+
+    for _ in range(50):
+        shift = rng.integers(-2, 3, 4)
+        bbox = tuple(int(value) for value in np.add(BBOX, shift))
+        face = crop(frame, bbox, rng)
+
+        assert cache.get(EmbeddingCache.thumbnail(face)) is not None
+
+
+def test_cache_misses_other_faces():
+    """Test that a different face in the same box does not hit the cache."""
+    rng = np.random.default_rng(0)
+    cache = EmbeddingCache()
+    cache.put(EmbeddingCache.thumbnail(crop(make_frame(0), BBOX, rng)), np.ones(4))
+
+    for seed in range(1, 20):
+        face = crop(make_frame(seed), BBOX, rng)
+
+        assert cache.get(EmbeddingCache.thumbnail(face)) is None
+
+
+def test_cache_returns_closest_face():
+    """Test that the embedding of the most similar cached face is returned."""
+    cache = EmbeddingCache(max_difference=10.0)
+    cache.put(thumbnail(100), np.ones(4))
+    cache.put(thumbnail(108), np.ones(4) * 2)
+
+    np.testing.assert_array_equal(cache.get(thumbnail(105)), np.ones(4) * 2)
+
+
+def thumbnail(level):
+    return np.full(256, level, dtype=np.float32)
+
+
+def test_cache_evicts_least_recently_used(clock):
+    """Test that the least recently used embedding is replaced when full."""
+    cache = EmbeddingCache(capacity=2)
+    cache.put(thumbnail(10), np.ones(4))
+    cache.put(thumbnail(50), np.ones(4) * 2)
+    assert cache.get(thumbnail(10)) is not None
+
+    cache.put(thumbnail(90), np.ones(4) * 3)
+
+    assert len(cache) == 2
+    assert cache.get(thumbnail(50)) is None
+    np.testing.assert_array_equal(cache.get(thumbnail(10)), np.ones(4))
+
+
+def test_cache_entries_expire(clock):
+    """Test that embeddings older than the TTL are not returned."""
+    cache = EmbeddingCache(ttl=60.0)
+    cache.put(thumbnail(10), np.ones(4))
+
+    clock[0] += 59.0
+    assert cache.get(thumbnail(10)) is not None
+
+    clock[0] += 2.0
+    assert cache.get(thumbnail(10)) is None
+    assert len(cache) == 0
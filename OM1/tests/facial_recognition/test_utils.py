@@ -0,0 +1,189 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+from facial_recognition import utils
+from facial_recognition.utils import (
+    FaceTracker,
+    FrameGrabber,
+    TextOverlay,
+    augment_face_batch,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(utils.time, "time", lambda: now[0])
+    return now
+
+
+def test_tracker_matches_moved_face(clock):
+    """Test that a face that moved a little keeps its track."""
+    tracker = FaceTracker(iou_threshold=0.5, max_age=5.0)
+    tracker.add((0, 0, 100, 100), "alice", 0.9, {"name": "Alice"})
+
+    (track,) = tracker.match([(5, 5, 105, 105)])
+
+    assert track["person_id"] == "alice"
+    assert track["bbox"] == (5, 5, 105, 105)
+
+
+def test_tracker_leaves_new_faces_unmatched(clock):
+    """Test that faces away from every track and repeated boxes need recognition."""
+    tracker = FaceTracker(iou_threshold=0.5, max_age=5.0)
+    tracker.add((0, 0, 100, 100), "alice", 0.9, {})
+
+    tracks = tracker.match([(0, 0, 100, 100), (300, 300, 400, 400), (0, 0, 100, 100)])
+
+    assert tracks[0]["person_id"] == "alice"
+    assert tracks[1] is None
+    assert tracks[2] is None
+
+
+def test_tracker_ages_out_unseen_tracks(clock):
+    """Test that tracks not seen for longer than max_age are dropped."""
+    tracker = FaceTracker(iou_threshold=0.5, max_age=5.0)
+    tracker.add((0, 0, 100, 100), "alice", 0.9, {})
+
+    clock[0] += 4.0
+    assert tracker.match([(0, 0, 100, 100)])[0] is not None
+
+    clock[0] += 6.0
+    assert tracker.match([(0, 0, 100, 100)]) == [None]
+
+
+@pytest.mark.parametrize("org", [(10, 30), (0, 5), (-20, 12), (150, 70), (500, 500)])
+def test_text_overlay_matches_put_text(org):
+    """Test that cached text tiles draw exactly what cv2.putText draws."""
+    image = np.random.default_rng(0).integers(0, 256, (80, 160, 3), dtype=np.uint8)
+    expected = image.copy()
+    cv2.putText(
+        expected, "FPS: 29.7", org, cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2
+    )
+
+    overlay = TextOverlay()
+    overlay.draw(image.copy(), "FPS: 29.7", org)
+    result = overlay.draw(image, "FPS: 29.7", org)
+
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_text_overlay_capacity():
+    """Test that the least recently drawn text tiles are evicted."""
+    overlay = TextOverlay(capacity=2)
+    image = np.zeros((40, 200, 3), dtype=np.uint8)
+
+    for text in ("a", "b", "a", "c"):
+        overlay.draw(image, text, (0, 30))
+
+    assert list(overlay._tiles) == ["a", "c"]
+
+
+class FakeCamera:
+    def __init__(self, num_frames):
+        self.num_frames = num_frames
+        self.reads = 0
+        self.gate = threading.Semaphore(0)
+
+    def read(self):
+        self.gate.acquire()
+        if self.reads == self.num_frames:
+            return False, None
+        self.reads += 1
+        return True, np.full((2, 2, 3), self.reads, dtype=np.uint8)
+
+
+def test_frame_grabber_returns_latest_frame():
+    """Test that only the newest frame is returned, and only once."""
+    camera = FakeCamera(num_frames=3)
+    grabber = FrameGrabber(camera).start()
+
+    camera.gate.release()
+    camera.gate.release()
+    ret, frame = grabber.get_latest()
+    while frame[0, 0, 0] != 2:
+        ret, frame = grabber.get_latest()
+    assert ret
+
+    assert grabber.get_latest(timeout=0.05) == (False, None)
+
+    camera.gate.release()
+    ret, frame = grabber.get_latest()
+    assert ret and frame[0, 0, 0] == 3
+
+    grabber.running = False
+    camera.gate.release()
+    grabber.stop()
+
+
+def test_frame_grabber_stops_when_camera_fails():
+    """Test that a failed read ends capture and get_latest stops waiting."""
+    camera = FakeCamera(num_frames=0)
+    grabber = FrameGrabber(camera).start()
+
+    camera.gate.release()
+
+    assert grabber.get_latest(timeout=5.0) == (False, None)
+    grabber.stop()
+    assert not grabber.running
+
+
+@pytest.mark.parametrize("angle", [-7.3, 0.0, 10.0])
+def test_rotate_image_matches_warp_affine(angle):
+    """Test that the cached remap rotates like cv2.warpAffine."""
+    image = cv2.GaussianBlur(
+        np.random.default_rng(0).integers(0, 256, (97, 75, 3), dtype=np.uint8),
+        (5, 5),
+        2.0,
+    )
+    matrix = cv2.getRotationMatrix2D((75 // 2, 97 // 2), angle, 1.0)
+    expected = cv2.warpAffine(image, matrix, (75, 97), borderMode=cv2.BORDER_REFLECT)
+
+    rotated = utils.rotate_image(image, angle)
+
+    assert rotated.shape == image.shape
+    assert np.abs(rotated.astype(int) - expected).max() <= 1
+
+
+def test_augment_face_batch_groups_rounds():
+    """Test that batched augmentation returns one uint8 round of all faces per augmentation."""
+    dark = np.full((120, 100, 3), 60, dtype=np.uint8)
+    bright = np.full((80, 60, 3), 180, dtype=np.uint8)
+
+    augmented = augment_face_batch([dark, bright], num_augmentations=3, device="cpu")
+
+    assert augmented.shape == (6, 120, 100, 3)
+    assert augmented.dtype == np.uint8
+    # Flat faces stay flat, scaled by a brightness factor in [0.7, 1.3]
+    for i, face in enumerate(augmented):
+        level = 60 if i % 2 == 0 else 180
+        assert face.min() == face.max()
+        assert 0.7 * level - 1 <= face[0, 0, 0] <= min(1.3 * level + 1, 255)
+
+
+def test_augment_face_batch_matches_augmenter():
+    """Test that a batched augmentation matches the per-image warp for the same parameters."""
+    rng = np.random.default_rng(0)
+    face = cv2.GaussianBlur(
+        rng.integers(0, 256, (96, 80, 3), dtype=np.uint8), (9, 9), 3
+    )
+    utils.random.seed(7)
+
+    (augmented,) = augment_face_batch([face], num_augmentations=1, device="cpu")
+
+    utils.random.seed(7)
+    flip = utils.random.choice([True, False])
+    rotation = utils.random.uniform(-10, 10)
+    crop_percent = utils.random.uniform(0.85, 0.95)
+    transform = utils._augmentation_transform(96, 80, flip, rotation, crop_percent)
+    brightness = utils.random.uniform(0.7, 1.3)
+    warped = cv2.warpAffine(
+        face, transform, (80, 96), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT
+    )
+    expected = utils.adjust_brightness(warped, brightness)
+
+    # Compare away from the border, where the reflection modes differ
+    difference = np.abs(augmented.astype(int) - expected.astype(int))[8:-8, 8:-8]
+    assert np.mean(difference) < 2.0
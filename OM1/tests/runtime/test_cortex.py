@@ -156,8 +156,10 @@ async def test_run_full_runtime(runtime):
 
     cortex_loop_task = asyncio.create_task(asyncio.sleep(0))
     cortex_runtime._run_cortex_loop = AsyncMock(return_value=cortex_loop_task)
+    cortex_runtime.action_orchestrator.close = AsyncMock()
 
     await cortex_runtime.run()
 
     cortex_runtime._start_input_listeners.assert_called_once()
     cortex_runtime._run_cortex_loop.assert_called_once()
+    cortex_runtime.action_orchestrator.close.assert_awaited_once()